@@ -1,24 +1,343 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Cookie, Response, Header
+from fastapi import FastAPI, APIRouter, HTTPException, Cookie, Request, Response, Header, Query
 from dotenv import load_dotenv
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import InsertOne, UpdateOne, DeleteOne, ReplaceOne, ReturnDocument, monitoring
+from pymongo.errors import BulkWriteError
 import os
+import asyncio
+import contextvars
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional
+from pydantic import BaseModel, Field, ConfigDict, TypeAdapter, ValidationError
+from typing import Dict, List, Literal, Optional, Union
+from typing_extensions import TypedDict
+from collections import Counter, OrderedDict, deque
 import uuid
+import json
+import csv
+import io
+import base64
+import hashlib
+import re
+import bisect
+import time
+import sys
+import hmac
+import threading
+import zlib
 from datetime import datetime, timezone, timedelta
-import requests
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import httpx
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Metrics
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class MetricsRegistry:
+    """Counters, gauges and histograms rendered in the Prometheus text format.
+
+    Mongo command listeners record from Motor's executor threads, so every
+    read and write holds the lock.
+    """
+
+    def __init__(self):
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, labels: Optional[dict] = None, amount: float = 1):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def set(self, name: str, value: float, labels: Optional[dict] = None):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            self._gauges[key] = value
+
+    def add(self, name: str, amount: float, labels: Optional[dict] = None):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, labels: Optional[dict] = None):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            buckets, total, count = self._histograms.get(key, ([0] * len(LATENCY_BUCKETS), 0.0, 0))
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if value <= bound:
+                    buckets[i] += 1
+            self._histograms[key] = (buckets, total + value, count + 1)
+
+    def render(self) -> str:
+        def series(name, labels, extra=()):
+            pairs = [*labels, *extra]
+            if not pairs:
+                return name
+            return name + "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            histograms = {key: (list(buckets), total, count) for key, (buckets, total, count) in self._histograms.items()}
+        lines = []
+        for kind, values in (("counter", counters), ("gauge", gauges)):
+            for name in sorted({name for name, _ in values}):
+                lines.append(f"# TYPE {name} {kind}")
+                for (metric, labels), value in values.items():
+                    if metric == name:
+                        lines.append(f"{series(name, labels)} {value}")
+        for name in sorted({name for name, _ in histograms}):
+            lines.append(f"# TYPE {name} histogram")
+            for (metric, labels), (buckets, total, count) in histograms.items():
+                if metric != name:
+                    continue
+                for bound, bucket_count in zip(LATENCY_BUCKETS, buckets):
+                    lines.append(f"{series(name + '_bucket', labels, [('le', bound)])} {bucket_count}")
+                lines.append(f"{series(name + '_bucket', labels, [('le', '+Inf')])} {count}")
+                lines.append(f"{series(name + '_sum', labels)} {total}")
+                lines.append(f"{series(name + '_count', labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+
+# Profilers currently running; each accumulates Mongo command time
+active_profiles = set()
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Record command latency and track in-flight commands for load shedding.
+
+    Motor runs commands on executor threads, so the in-flight count is locked.
+    """
+
+    def __init__(self):
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        with self._lock:
+            self.in_flight += 1
+
+    def succeeded(self, event):
+        self._record(event)
+
+    def failed(self, event):
+        self._record(event)
+        metrics.inc("mongo_command_failures_total", {"command": event.command_name})
+
+    def _record(self, event):
+        with self._lock:
+            self.in_flight -= 1
+        duration = event.duration_micros / 1e6
+        metrics.observe("mongo_command_duration_seconds", duration, {"command": event.command_name})
+        for profile in list(active_profiles):
+            profile.add_mongo_time(duration)
+
+class MongoPoolMetrics(monitoring.ConnectionPoolListener):
+    """Track operations waiting for a pooled connection.
+
+    Commands only start once a connection is checked out, so the command
+    count alone tops out at maxPoolSize; the queue behind it shows overload.
+    """
+
+    def __init__(self):
+        self.waiting = 0
+        self._lock = threading.Lock()
+
+    def _add_waiting(self, amount: int):
+        with self._lock:
+            self.waiting += amount
+
+    def connection_check_out_started(self, event):
+        self._add_waiting(1)
+
+    def connection_checked_out(self, event):
+        self._add_waiting(-1)
+
+    def connection_check_out_failed(self, event):
+        self._add_waiting(-1)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+    def connection_checked_in(self, event):
+        pass
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+# Pool limits apply per worker process
+MONGO_POOL_OPTIONS = {
+    option: int(os.environ[variable])
+    for option, variable in (
+        ("maxPoolSize", "MONGO_MAX_POOL_SIZE"),
+        ("minPoolSize", "MONGO_MIN_POOL_SIZE"),
+        ("waitQueueTimeoutMS", "MONGO_WAIT_QUEUE_TIMEOUT_MS"),
+    )
+    if os.environ.get(variable)
+}
+mongo_commands = MongoCommandMetrics()
+mongo_pool = MongoPoolMetrics()
+client = AsyncIOMotorClient(
+    mongo_url, tz_aware=True, event_listeners=[mongo_commands, mongo_pool], **MONGO_POOL_OPTIONS
+)
 db = client[os.environ['DB_NAME']]
 
+# Request profiling
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'false').lower() == 'true'
+PROFILING_TOKEN = os.environ.get('PROFILING_TOKEN', '')
+PROFILING_DIR = Path(os.environ.get('PROFILING_DIR', ROOT_DIR / 'profiles'))
+PROFILING_INTERVAL = float(os.environ.get('PROFILING_INTERVAL', '0.001'))
+# Stack frame markers ("function (file.py") per summary category, checked in order
+PROFILE_CATEGORIES = (
+    ("idle_loop_ms", ("select (selectors.py",)),
+    ("json_encoding_ms", (
+        "dump_json (type_adapter.py", "dump_python (type_adapter.py", "jsonable_encoder (encoders.py",
+        "(encoder.py", "render (responses.py",
+    )),
+    ("pydantic_validation_ms", (
+        "validate_python (type_adapter.py", "model_validate (main.py", "__init__ (main.py",
+        "serialize_response (routing.py",
+    )),
+)
+
+# Cross-worker messaging
+REDIS_URL = os.environ.get('REDIS_URL')
+SESSION_EVICT_CHANNEL = "sessions:evict"
+TASK_EVENT_CHANNEL = "tasks:events"
+MESSAGE_BUS_RECONNECT_MIN = 0.5
+MESSAGE_BUS_RECONNECT_MAX = 30
+
+# Rate limiting and load shedding
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+RATE_LIMIT_PER_SECOND = float(os.environ.get('RATE_LIMIT_PER_SECOND', '20'))
+RATE_LIMIT_BURST = float(os.environ.get('RATE_LIMIT_BURST', '40'))
+RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', '100000'))
+CONCURRENCY_LIMITS = {
+    "read": int(os.environ.get('CONCURRENCY_LIMIT_READ', '200')),
+    "write": int(os.environ.get('CONCURRENCY_LIMIT_WRITE', '100')),
+    "stream": int(os.environ.get('CONCURRENCY_LIMIT_STREAM', '500')),
+}
+STREAM_PATHS = {"/api/tasks/export", "/api/tasks/stream"}
+# Commands running plus operations queued for a connection; defaults to a full pool and as many waiting
+MONGO_IN_FLIGHT_LIMIT = int(os.environ.get('MONGO_IN_FLIGHT_LIMIT', str(2 * MONGO_POOL_OPTIONS.get("maxPoolSize", 100))))
+SHED_RETRY_AFTER = 1
+UNLIMITED_PATHS = {"/metrics"}
+# Routes that never resolve a user, so a token does not move them off the IP bucket
+IP_LIMITED_PATHS = {"/api/auth/session", "/api/auth/logout"}
+
+# Session cache settings
+SESSION_CACHE_SIZE = int(os.environ.get('SESSION_CACHE_SIZE', '10000'))
+SESSION_CACHE_TTL = int(os.environ.get('SESSION_CACHE_TTL', '60'))
+
+# Session limits (0 disables the per-user cap)
+MAX_SESSIONS_PER_USER = int(os.environ.get('MAX_SESSIONS_PER_USER', '10'))
+SESSION_REAPER_INTERVAL = int(os.environ.get('SESSION_REAPER_INTERVAL', '3600'))
+
+# Auth provider
+AUTH_PROVIDER_URL = os.environ.get(
+    'AUTH_PROVIDER_URL', 'https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data'
+)
+AUTH_PROVIDER_TIMEOUT = float(os.environ.get('AUTH_PROVIDER_TIMEOUT', '10'))
+AUTH_PROVIDER_CONNECT_TIMEOUT = float(os.environ.get('AUTH_PROVIDER_CONNECT_TIMEOUT', '3'))
+AUTH_PROVIDER_RETRIES = int(os.environ.get('AUTH_PROVIDER_RETRIES', '2'))
+AUTH_PROVIDER_BACKOFF = float(os.environ.get('AUTH_PROVIDER_BACKOFF', '0.25'))
+AUTH_PROVIDER_MAX_CONNECTIONS = int(os.environ.get('AUTH_PROVIDER_MAX_CONNECTIONS', '100'))
+
+# Task list pagination
+PRIORITY_RANK = {"low": 0, "medium": 1, "high": 2}
+SORT_FIELDS = {
+    "due_date": "due_date",
+    "priority": "priority_rank",
+    "created_at": "created_at",
+    "updated_at": "updated_at",
+}
+DATE_SORT_FIELDS = {"due_date", "created_at", "updated_at"}
+
+# Sparse fieldsets
+LIST_VIEW_FIELDS = ["id", "title", "status", "priority", "due_date"]
+
+# Task export
+EXPORT_BATCH_SIZE = 500
+EXPORT_FIELDS = ["id", "title", "description", "due_date", "status", "priority", "created_at", "updated_at"]
+
+# Bulk operations
+MAX_BULK_OPERATIONS = 1000
+
+# Task statistics
+TASK_STATUSES = ("pending", "completed")
+TASK_COUNTERS_ENABLED = os.environ.get('TASK_COUNTERS_ENABLED', 'false').lower() == 'true'
+TASK_COUNTER_RESYNC_INTERVAL = int(os.environ.get('TASK_COUNTER_RESYNC_INTERVAL', '3600'))
+
+# Task change feed
+TASK_EVENT_BUFFER_SIZE = int(os.environ.get('TASK_EVENT_BUFFER_SIZE', '256'))
+TASK_EVENT_QUEUE_SIZE = int(os.environ.get('TASK_EVENT_QUEUE_SIZE', '1000'))
+TASK_EVENT_MAX_USERS = int(os.environ.get('TASK_EVENT_MAX_USERS', '10000'))
+TASK_CHANGE_STREAM_ENABLED = os.environ.get('TASK_CHANGE_STREAM_ENABLED', 'false').lower() == 'true'
+STREAM_KEEPALIVE_SECONDS = 15
+
+# Task search
+SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND', 'mongo')  # mongo, memory
+SEARCH_MAX_RESULTS = int(os.environ.get('SEARCH_MAX_RESULTS', '200'))
+SEARCH_INDEX_MAX_USERS = int(os.environ.get('SEARCH_INDEX_MAX_USERS', '1000'))
+SEARCH_FIELD_WEIGHTS = {"title": 3, "description": 1}
+# Lowercased words of each searchable field, indexed for anchored prefix matches
+SEARCH_TERM_FIELDS = {"title": "title_terms", "description": "description_terms"}
+
+# Task agenda
+AGENDA_MAX_TASKS = int(os.environ.get('AGENDA_MAX_TASKS', '500'))
+
+# Response compression and list formats
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', '1024'))
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', '4'))
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "application/msgpack", "text/")
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+COLUMNAR_MEDIA_TYPE = "application/vnd.tasks.columnar+json"
+
+# Delta sync
+SYNC_OVERLAP_SECONDS = int(os.environ.get('SYNC_OVERLAP_SECONDS', '5'))
+SYNC_TOMBSTONE_TTL_DAYS = int(os.environ.get('SYNC_TOMBSTONE_TTL_DAYS', '30'))
+
+# Task archival
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', '90'))
+ARCHIVE_INTERVAL = int(os.environ.get('ARCHIVE_INTERVAL', '3600'))
+ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', '500'))
+# Deletes in flight per worker, leaving the rest of the connection pool to requests
+ARCHIVE_DELETE_CONCURRENCY = int(os.environ.get('ARCHIVE_DELETE_CONCURRENCY', '4'))
+
 # Create the main app
 app = FastAPI()
 api_router = APIRouter(prefix="/api")
@@ -48,6 +367,7 @@ class Task(BaseModel):
     due_date: Optional[datetime] = None
     status: str = "pending"  # pending, completed
     priority: str = "medium"  # low, medium, high
+    version: int = 1
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
@@ -64,6 +384,879 @@ class TaskUpdate(BaseModel):
     status: Optional[str] = None
     priority: Optional[str] = None
 
+class TaskAgenda(BaseModel):
+    overdue: List[Task]
+    today: List[Task]
+    upcoming: List[Task]
+
+class TaskSync(BaseModel):
+    tasks: List[Task]
+    deleted: List[str]
+    token: str
+    has_more: bool
+
+class TaskPayload(TypedDict):
+    """Serialization-only view of a stored task document."""
+    id: str
+    user_id: str
+    title: str
+    description: Optional[str]
+    due_date: Optional[datetime]
+    status: str
+    priority: str
+    version: int
+    created_at: datetime
+    updated_at: datetime
+
+class TaskSyncPayload(TypedDict):
+    tasks: List[TaskPayload]
+    deleted: List[str]
+    token: str
+    has_more: bool
+
+class ArchivedTaskPayload(TaskPayload):
+    archived_at: datetime
+
+# Sparse fieldset of a task, as selected with ``fields=``
+PartialTaskPayload = TypedDict("PartialTaskPayload", TaskPayload.__annotations__, total=False)
+
+TASK_DEFAULTS = {"description": None, "due_date": None, "status": "pending", "priority": "medium", "version": 1}
+
+task_adapter = TypeAdapter(TaskPayload)
+task_list_adapter = TypeAdapter(List[TaskPayload])
+task_agenda_adapter = TypeAdapter(Dict[str, List[TaskPayload]])
+partial_task_adapter = TypeAdapter(PartialTaskPayload)
+partial_task_list_adapter = TypeAdapter(List[PartialTaskPayload])
+archived_task_list_adapter = TypeAdapter(List[ArchivedTaskPayload])
+task_sync_adapter = TypeAdapter(TaskSyncPayload)
+
+class TaskBulkOperation(BaseModel):
+    op: Literal["create", "update", "delete"]
+    id: Optional[str] = None
+    data: dict = Field(default_factory=dict)
+
+class TaskBulkRequest(BaseModel):
+    operations: List[TaskBulkOperation] = Field(max_length=MAX_BULK_OPERATIONS)
+    ordered: bool = True
+
+# Request profiling
+class RequestProfile:
+    """Sample the event loop thread's stack while a request is handled.
+
+    Samples are written as collapsed stacks (flamegraph.pl / speedscope) with
+    a JSON summary of where the time went. Other requests served by the loop
+    at the same time show up in the samples too.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.thread_id = threading.get_ident()
+        self.stacks = Counter()
+        self.mongo_seconds = 0.0
+        self._mongo_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def __enter__(self):
+        self.started = time.monotonic()
+        active_profiles.add(self)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        active_profiles.discard(self)
+        self.wall_seconds = time.monotonic() - self.started
+
+    def add_mongo_time(self, seconds: float):
+        # Called from Motor's executor threads
+        with self._mongo_lock:
+            self.mongo_seconds += seconds
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(f"{frame.f_code.co_name} ({Path(frame.f_code.co_filename).name}:{frame.f_code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def summary(self) -> dict:
+        total = sum(self.stacks.values()) or 1
+        shares = Counter()
+        for stack, count in self.stacks.items():
+            # A stack counts toward its first matching category; encoders run inside serialize_response
+            for category, markers in PROFILE_CATEGORIES:
+                if any(marker in stack for marker in markers):
+                    shares[category] += count
+                    break
+        summary = {
+            "wall_ms": round(self.wall_seconds * 1000, 2),
+            "samples": sum(self.stacks.values()),
+            "mongo_ms": round(self.mongo_seconds * 1000, 2),
+        }
+        for category, _ in PROFILE_CATEGORIES:
+            summary[category] = round(shares[category] / total * self.wall_seconds * 1000, 2)
+        return summary
+
+    def write(self, name: str) -> Path:
+        PROFILING_DIR.mkdir(parents=True, exist_ok=True)
+        path = PROFILING_DIR / name
+        path.with_suffix(".collapsed").write_text(
+            "".join(f"{stack} {count}\n" for stack, count in self.stacks.items())
+        )
+        path.with_suffix(".json").write_text(json.dumps(self.summary(), indent=2))
+        return path
+
+# Rate limiting
+class TokenBucketLimiter:
+    """In-memory token buckets keyed by user id or client IP."""
+
+    def __init__(self, rate: float, burst: float, max_keys: int):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+
+    def acquire(self, key: str) -> float:
+        """Take a token and return 0, or return the seconds until one is available."""
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate
+        self._buckets[key] = (tokens, now)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+rate_limiter = TokenBucketLimiter(RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST, RATE_LIMIT_MAX_KEYS)
+
+# Set by the load-limiting middleware for requests that are not tied to a user yet
+client_ip = contextvars.ContextVar("client_ip", default="unknown")
+
+def enforce_rate_limit(key: str):
+    if not RATE_LIMIT_ENABLED:
+        return
+    wait = rate_limiter.acquire(key)
+    if wait:
+        metrics.inc("rate_limited_total", {"key": key.split(":", 1)[0]})
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests",
+            headers={"Retry-After": str(max(1, round(wait)))}
+        )
+
+def route_class(request: Request) -> str:
+    if request.url.path in STREAM_PATHS:
+        return "stream"
+    return "read" if request.method in ("GET", "HEAD") else "write"
+
+# Session cache
+class SessionCache:
+    """Bounded LRU cache of resolved users keyed by session token.
+
+    Entries live for at most ``ttl`` seconds and never outlive the session's
+    own ``expires_at``.
+    """
+
+    def __init__(self, maxsize: int, ttl: int):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, token: str) -> Optional[User]:
+        entry = self._entries.get(token)
+        if entry is None:
+            self.misses += 1
+            return None
+        user, deadline = entry
+        if deadline <= time.monotonic():
+            del self._entries[token]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(token)
+        self.hits += 1
+        return user
+
+    def set(self, token: str, user: User, expires_at: datetime):
+        if self.maxsize <= 0:
+            return
+        remaining = (expires_at - datetime.now(timezone.utc)).total_seconds()
+        ttl = min(self.ttl, remaining)
+        if ttl <= 0:
+            return
+        self._entries[token] = (user, time.monotonic() + ttl)
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def evict(self, token: str):
+        self._entries.pop(token, None)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+session_cache = SessionCache(SESSION_CACHE_SIZE, SESSION_CACHE_TTL)
+
+# Task change feed
+class TaskEventBroker:
+    """Fans task change events out to each user's open streams.
+
+    The most recent events per user are kept so a reconnecting client can
+    resume from its Last-Event-ID. A client that is too far behind, or whose
+    queue overflows, receives a ``reset`` event and should refetch.
+
+    Event ids are the user's change version, or the change stream resume
+    token when change streams publish the events; either is the same on
+    every worker.
+    """
+
+    def __init__(self, buffer_size: int, queue_size: int, max_users: int):
+        self.buffer_size = buffer_size
+        self.queue_size = queue_size
+        self.max_users = max_users
+        self._history = OrderedDict()
+        self._subscribers = {}
+        self._listeners = []
+
+    def add_listener(self, listener):
+        """Call ``listener(user_id, event)`` for every published event."""
+        self._listeners.append(listener)
+
+    def publish(
+        self, user_id: str, event_type: str, task_id: str, task: Optional[dict] = None, event_id: Union[int, str, None] = None
+    ):
+        """Deliver an event; ``event_id`` defaults to the next local sequence number."""
+        sequence, events = self._history.pop(user_id, (0, deque(maxlen=self.buffer_size)))
+        event_id = event_id or sequence + 1
+        event = {"id": event_id, "type": event_type, "task_id": task_id, "task": task}
+        events.append(event)
+        if isinstance(event_id, int):
+            sequence = max(sequence, event_id)
+        self._history[user_id] = (sequence, events)
+        while len(self._history) > self.max_users:
+            self._history.popitem(last=False)
+        
+        for listener in self._listeners:
+            listener(user_id, event)
+        for queue in self._subscribers.get(user_id, ()):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"type": "reset"})
+
+    def subscribe(self, user_id: str, last_event_id: Union[int, str, None] = None):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        missed = []
+        if isinstance(last_event_id, str):
+            # Resume tokens are opaque, so the client's event must still be buffered
+            events = list(self._history.get(user_id, (0, ()))[1])
+            ids = [event["id"] for event in events]
+            missed = events[ids.index(last_event_id) + 1:] if last_event_id in ids else [{"type": "reset"}]
+        elif last_event_id is not None:
+            sequence, events = self._history.get(user_id, (0, deque()))
+            if last_event_id > sequence or (events and last_event_id < min(e["id"] for e in events) - 1):
+                missed = [{"type": "reset"}]
+            else:
+                missed = [event for event in events if event["id"] > last_event_id]
+        return queue, missed
+
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue):
+        queues = self._subscribers.get(user_id)
+        if queues:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[user_id]
+
+task_events = TaskEventBroker(TASK_EVENT_BUFFER_SIZE, TASK_EVENT_QUEUE_SIZE, TASK_EVENT_MAX_USERS)
+
+async def publish_task_event(
+    user_id: str, event_type: str, task_id: str, task: Optional[dict] = None, event_id: Optional[int] = None
+):
+    """Publish a task change to this worker's streams and, with Redis, to every other worker.
+
+    ``event_id`` is the user's change version, which is shared by all workers.
+    """
+    # With change streams enabled the shared watcher publishes every event
+    if TASK_CHANGE_STREAM_ENABLED:
+        return
+    task_events.publish(user_id, event_type, task_id, task, event_id)
+    await message_bus.publish(TASK_EVENT_CHANNEL, {
+        "user_id": user_id, "type": event_type, "task_id": task_id, "task": task, "id": event_id
+    })
+
+def format_task_event(event: dict) -> str:
+    lines = []
+    if "id" in event:
+        lines.append(f"id: {event['id']}")
+    lines.append(f"event: {event['type']}")
+    data = {key: value for key, value in event.items() if key not in ("id", "type")}
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+async def watch_task_changes():
+    """Publish task changes from a MongoDB change stream (replica sets only).
+
+    Delete events are routed only when the collection has pre-images enabled.
+    """
+    resume_token = None
+    while True:
+        try:
+            async with db.tasks.watch(
+                full_document="updateLookup",
+                full_document_before_change="whenAvailable",
+                resume_after=resume_token
+            ) as stream:
+                async for change in stream:
+                    resume_token = stream.resume_token
+                    # Every worker watches the same stream, so the token is a shared event id
+                    event_id = change["_id"]["_data"]
+                    operation = change["operationType"]
+                    if operation in ("insert", "update", "replace"):
+                        doc = change.get("fullDocument")
+                        if doc:
+                            event_type = "created" if operation == "insert" else "updated"
+                            task = Task(**doc).model_dump(mode="json")
+                            task_events.publish(doc["user_id"], event_type, doc["id"], task, event_id)
+                    elif operation == "delete":
+                        doc = change.get("fullDocumentBeforeChange")
+                        if doc:
+                            task_events.publish(doc["user_id"], "deleted", doc["id"], event_id=event_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Task change stream failed, reconnecting")
+            await asyncio.sleep(1)
+
+# Task search
+def tokenize(text: Optional[str]) -> List[str]:
+    return re.findall(r"\w+", text.lower()) if text else []
+
+class TaskSearchIndex:
+    """In-process inverted index over one user's task titles and descriptions.
+
+    Used when the deployment has no MongoDB text index support.
+    """
+
+    def __init__(self):
+        self._postings = {}
+        self._tokens_by_task = {}
+        self._sorted_tokens = None
+
+    def add(self, task: dict):
+        self.remove(task["id"])
+        weights = Counter()
+        for field, weight in SEARCH_FIELD_WEIGHTS.items():
+            for token in tokenize(task.get(field)):
+                weights[token] += weight
+        for token, weight in weights.items():
+            if token not in self._postings:
+                self._postings[token] = {}
+                self._sorted_tokens = None
+            self._postings[token][task["id"]] = weight
+        self._tokens_by_task[task["id"]] = list(weights)
+
+    def remove(self, task_id: str):
+        for token in self._tokens_by_task.pop(task_id, ()):
+            postings = self._postings[token]
+            postings.pop(task_id, None)
+            if not postings:
+                del self._postings[token]
+                self._sorted_tokens = None
+
+    def _prefixed(self, prefix: str) -> List[str]:
+        if self._sorted_tokens is None:
+            self._sorted_tokens = sorted(self._postings)
+        start = bisect.bisect_left(self._sorted_tokens, prefix)
+        end = bisect.bisect_left(self._sorted_tokens, prefix + "\uffff")
+        return self._sorted_tokens[start:end]
+
+    def search(self, terms: List[str], prefix: bool = True) -> List[str]:
+        """Return ids of tasks matching every term, best matches first.
+
+        With ``prefix`` the last term also matches longer words.
+        """
+        scores = None
+        for position, term in enumerate(terms):
+            if prefix and position == len(terms) - 1:
+                tokens = self._prefixed(term)
+            else:
+                tokens = [term] if term in self._postings else []
+            term_scores = {}
+            for token in tokens:
+                for task_id, weight in self._postings[token].items():
+                    term_scores[task_id] = max(term_scores.get(task_id, 0), weight)
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {
+                    task_id: score + term_scores[task_id]
+                    for task_id, score in scores.items()
+                    if task_id in term_scores
+                }
+            if not scores:
+                return []
+        return sorted(scores, key=lambda task_id: (-scores[task_id], task_id))
+
+search_indexes = OrderedDict()
+
+async def get_search_index(user_id: str) -> TaskSearchIndex:
+    index = search_indexes.get(user_id)
+    if index is not None:
+        search_indexes.move_to_end(user_id)
+        return index
+    index = TaskSearchIndex()
+    projection = {"_id": 0, "id": 1, **{field: 1 for field in SEARCH_FIELD_WEIGHTS}}
+    async for task in db.tasks.find({"user_id": user_id}, projection):
+        index.add(task)
+    search_indexes[user_id] = index
+    while len(search_indexes) > SEARCH_INDEX_MAX_USERS:
+        search_indexes.popitem(last=False)
+    return index
+
+def update_search_index(user_id: str, event: dict):
+    index = search_indexes.get(user_id)
+    if index is None:
+        return
+    if event["type"] in ("deleted", "archived"):
+        index.remove(event["task_id"])
+    elif event["task"]:
+        index.add(event["task"])
+    else:
+        # Bulk updates publish no post-image; rebuild on the next search
+        del search_indexes[user_id]
+
+task_events.add_listener(update_search_index)
+
+# Cross-worker messaging
+class MessageBus:
+    """Broadcast messages to the other worker processes over Redis pub/sub.
+
+    Without REDIS_URL this is a no-op and the process runs standalone.
+    """
+
+    def __init__(self, url: Optional[str]):
+        self.url = url
+        self.worker_id = str(uuid.uuid4())
+        self.redis = None
+        self._handlers = {}
+
+    def subscribe(self, channel: str, handler):
+        self._handlers[channel] = handler
+
+    async def connect(self):
+        if self.url:
+            import redis.asyncio as redis
+            self.redis = redis.from_url(self.url)
+
+    async def close(self):
+        if self.redis:
+            await self.redis.aclose()
+
+    async def publish(self, channel: str, message: dict):
+        """Broadcast ``message``; failures are logged, never raised into the request."""
+        if not self.redis:
+            return
+        payload = json.dumps({"origin": self.worker_id, "message": message})
+        try:
+            await self.redis.publish(channel, payload)
+        except Exception:
+            metrics.inc("message_bus_publish_failures_total", {"channel": channel})
+            logger.warning("Could not publish to %s", channel, exc_info=True)
+
+    async def listen(self):
+        """Apply messages from other workers, reconnecting with backoff when Redis drops."""
+        delay = MESSAGE_BUS_RECONNECT_MIN
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(*self._handlers)
+                delay = MESSAGE_BUS_RECONNECT_MIN
+                async for item in pubsub.listen():
+                    if item["type"] == "message":
+                        self._dispatch(item)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                metrics.inc("message_bus_reconnects_total")
+                logger.warning("Message bus connection lost, reconnecting in %.1fs", delay, exc_info=True)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MESSAGE_BUS_RECONNECT_MAX)
+
+    def _dispatch(self, item: dict):
+        try:
+            payload = json.loads(item["data"])
+            # Messages from this worker were already applied locally
+            if payload["origin"] == self.worker_id:
+                return
+            channel = item["channel"].decode() if isinstance(item["channel"], bytes) else item["channel"]
+            self._handlers[channel](payload["message"])
+        except Exception:
+            logger.exception("Could not apply message bus message")
+
+message_bus = MessageBus(REDIS_URL)
+
+message_bus.subscribe(SESSION_EVICT_CHANNEL, lambda message: session_cache.evict(message["token"]))
+message_bus.subscribe(TASK_EVENT_CHANNEL, lambda message: task_events.publish(
+    message["user_id"], message["type"], message["task_id"], message["task"], message["id"]
+))
+
+async def evict_session(token: str):
+    session_cache.evict(token)
+    await message_bus.publish(SESSION_EVICT_CHANNEL, {"token": token})
+
+# Pagination helpers
+def priority_rank(priority: str) -> int:
+    return PRIORITY_RANK.get(priority, PRIORITY_RANK["medium"])
+
+def encode_cursor(sort: str, order: str, doc: dict) -> str:
+    value = doc.get(SORT_FIELDS[sort])
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps([sort, order, value, doc["id"]]).encode()
+    return base64.urlsafe_b64encode(payload).decode()
+
+def decode_cursor(cursor: str, sort: str, order: str):
+    try:
+        cursor_sort, cursor_order, value, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if cursor_sort != sort or cursor_order != order:
+            raise ValueError("cursor does not match sort order")
+        if value is not None and sort in DATE_SORT_FIELDS:
+            value = datetime.fromisoformat(value)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return value, last_id
+
+def keyset_filter(field: str, value, last_id: str, order: str) -> dict:
+    """Match documents strictly after ``(value, last_id)`` in the given order.
+
+    Missing values sort first ascending and last descending, as in MongoDB.
+    """
+    op = "$gt" if order == "asc" else "$lt"
+    if value is None:
+        if order == "asc":
+            return {"$or": [{field: None, "id": {op: last_id}}, {field: {"$ne": None}}]}
+        return {field: None, "id": {op: last_id}}
+    clauses = [{field: {op: value}}, {field: value, "id": {op: last_id}}]
+    if order == "desc":
+        clauses.append({field: None})
+    return {"$or": clauses}
+
+async def find_task_page(
+    collection: str,
+    query: dict,
+    sort: str,
+    order: str,
+    limit: int,
+    cursor: Optional[str],
+    projection: dict,
+    include_archived: bool = False
+) -> List[dict]:
+    """Fetch up to ``limit + 1`` tasks after ``cursor``; the extra row means another page exists."""
+    field = SORT_FIELDS[sort]
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort, order)
+        query = {"$and": [query, keyset_filter(field, value, last_id, order)]}
+    
+    direction = 1 if order == "asc" else -1
+    sort_spec = [(field, direction), ("id", direction)]
+    if not include_archived:
+        return await db[collection].find(query, projection).sort(sort_spec).limit(limit + 1).to_list(limit + 1)
+    
+    # Each side is cut to one page through its own index before merging
+    page = [{"$match": query}, {"$sort": dict(sort_spec)}, {"$limit": limit + 1}]
+    pipeline = page + [
+        {"$unionWith": {"coll": "tasks_archive", "pipeline": page}},
+        {"$sort": dict(sort_spec)},
+        {"$limit": limit + 1},
+        {"$project": projection},
+    ]
+    return await db[collection].aggregate(pipeline).to_list(limit + 1)
+
+# Task document helpers
+def search_terms(fields: dict) -> dict:
+    return {
+        terms_field: list(dict.fromkeys(tokenize(fields[field])))
+        for field, terms_field in SEARCH_TERM_FIELDS.items()
+        if field in fields
+    }
+
+def task_document(task: Task) -> dict:
+    task_doc = task.model_dump()
+    task_doc['priority_rank'] = priority_rank(task.priority)
+    task_doc.update(search_terms(task_doc))
+    return task_doc
+
+def task_update_document(task_update: TaskUpdate) -> dict:
+    update_data = task_update.model_dump(exclude_unset=True)
+    update_data['updated_at'] = datetime.now(timezone.utc)
+    if 'priority' in update_data:
+        update_data['priority_rank'] = priority_rank(update_data['priority'])
+    update_data.update(search_terms(update_data))
+    return update_data
+
+# Task counters
+def counter_increments(task: dict, amount: int) -> Counter:
+    increments = Counter({"total": amount})
+    if task.get('status') in TASK_STATUSES:
+        increments[f"by_status.{task['status']}"] += amount
+    if task.get('priority') in PRIORITY_RANK:
+        increments[f"by_priority.{task['priority']}"] += amount
+    return increments
+
+async def adjust_task_counters(user_id: str, before: Optional[dict] = None, after: Optional[dict] = None):
+    """Apply the change from ``before`` to ``after`` to the user's counters.
+
+    Counters are only updated once they exist; ``seed_task_counters``
+    creates them from the tasks collection on first read.
+    """
+    if not TASK_COUNTERS_ENABLED:
+        return
+    increments = Counter()
+    if before:
+        increments.update(counter_increments(before, -1))
+    if after:
+        increments.update(counter_increments(after, 1))
+    increments = {key: amount for key, amount in increments.items() if amount}
+    if increments:
+        await db.task_counters.update_one({"user_id": user_id}, {"$inc": increments})
+
+async def count_task_counters(user_id: str) -> dict:
+    counters = {"total": 0, "by_status": {}, "by_priority": {}}
+    groups = await db.tasks.aggregate([
+        {"$match": {"user_id": user_id}},
+        {"$group": {"_id": {"status": "$status", "priority": "$priority"}, "count": {"$sum": 1}}},
+    ]).to_list(None)
+    for group in groups:
+        counters["total"] += group["count"]
+        for key in ("status", "priority"):
+            value = group["_id"].get(key)
+            bucket = counters[f"by_{key}"]
+            bucket[value] = bucket.get(value, 0) + group["count"]
+    return counters
+
+def flatten_counters(counters: dict) -> Counter:
+    flat = Counter({"total": counters.get("total", 0)})
+    for key in ("by_status", "by_priority"):
+        for value, count in counters.get(key, {}).items():
+            flat[f"{key}.{value}"] = count
+    return flat
+
+async def seed_task_counters(user_id: str) -> dict:
+    """Create the user's counters from the tasks collection unless they exist.
+
+    ``$setOnInsert`` never overwrites counters another request already
+    created and incremented; drift from writes that raced the count is
+    repaired by ``resync_task_counters``.
+    """
+    counters = await count_task_counters(user_id)
+    return await db.task_counters.find_one_and_update(
+        {"user_id": user_id},
+        {"$setOnInsert": counters},
+        projection={"_id": 0, "user_id": 0},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+
+async def resync_task_counters(user_id: str) -> bool:
+    """Correct existing counters with ``$inc`` so concurrent adjustments are kept.
+
+    Users whose tasks change during the recount are left for the next pass.
+    """
+    version = await get_task_version(user_id)
+    stored = await db.task_counters.find_one({"user_id": user_id}, {"_id": 0})
+    if not stored:
+        return False
+    actual = await count_task_counters(user_id)
+    if await get_task_version(user_id) != version:
+        return False
+    increments = flatten_counters(actual)
+    increments.subtract(flatten_counters(stored))
+    increments = {key: amount for key, amount in increments.items() if amount}
+    if increments:
+        await db.task_counters.update_one({"user_id": user_id}, {"$inc": increments})
+    return True
+
+async def run_task_counter_resync():
+    while True:
+        await asyncio.sleep(TASK_COUNTER_RESYNC_INTERVAL)
+        try:
+            async for counters in db.task_counters.find({}, {"_id": 0, "user_id": 1}):
+                await resync_task_counters(counters["user_id"])
+        except Exception:
+            logger.exception("Task counter resync failed")
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    if not fields:
+        return None
+    selected = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = set(selected) - set(TaskPayload.__annotations__)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return ["id"] + [field for field in selected if field != "id"]
+
+def fields_projection(selected: Optional[List[str]], required: List[str]) -> dict:
+    """Build a Mongo projection for ``selected`` plus fields the handler itself needs."""
+    if selected is None:
+        return {"_id": 0}
+    return {"_id": 0, **{field: 1 for field in [*selected, *required]}}
+
+def select_fields(task: dict, selected: List[str]) -> dict:
+    return {field: task[field] for field in selected if field in task}
+
+# Fast response helpers
+def with_task_defaults(task: dict) -> dict:
+    for key, value in TASK_DEFAULTS.items():
+        task.setdefault(key, value)
+    return task
+
+def json_response(adapter: TypeAdapter, payload, response: Response) -> Response:
+    """Serialize stored documents straight to JSON, skipping response_model validation."""
+    return Response(adapter.dump_json(payload), media_type="application/json", headers=dict(response.headers))
+
+def task_response(task: dict, response: Response) -> Response:
+    return json_response(task_adapter, with_task_defaults(task), response)
+
+def task_list_response(tasks: List[dict], response: Response, accept: Optional[str] = None) -> Response:
+    return list_response(task_list_adapter, [with_task_defaults(task) for task in tasks], response, accept)
+
+# List formats
+def header_qualities(header: Optional[str]) -> Dict[str, float]:
+    """Parse an Accept-style header into ``{value: q}`` in the order given."""
+    qualities = {}
+    for entry in (header or "").split(","):
+        value, *params = [part.strip() for part in entry.split(";")]
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if value:
+            qualities[value.lower()] = quality
+    return qualities
+
+def negotiate_list_format(accept: Optional[str]) -> str:
+    """Pick "msgpack", "columnar" or "json" from an Accept header; JSON unless asked otherwise."""
+    formats = {COLUMNAR_MEDIA_TYPE: "columnar", "application/json": "json", "*/*": "json", "application/*": "json"}
+    if msgpack:
+        formats[MSGPACK_MEDIA_TYPE] = "msgpack"
+        formats["application/x-msgpack"] = "msgpack"
+    best, best_quality = "json", 0.0
+    for media_type, quality in header_qualities(accept).items():
+        if media_type in formats and quality > best_quality:
+            best, best_quality = formats[media_type], quality
+    return best
+
+def to_columns(rows: List[dict]) -> dict:
+    """Pivot rows into one list per field so keys are sent once."""
+    fields = list(dict.fromkeys(field for row in rows for field in row))
+    return {field: [row.get(field) for row in rows] for field in fields}
+
+def list_response(adapter: TypeAdapter, items: list, response: Response, accept: Optional[str] = None) -> Response:
+    """Serialize a task list in the format negotiated from ``accept``."""
+    list_format = negotiate_list_format(accept)
+    response.headers["Vary"] = "Accept"
+    if list_format == "msgpack":
+        # Datetimes become the compact MessagePack timestamp extension
+        body = msgpack.packb(adapter.dump_python(items), datetime=True)
+        return Response(body, media_type=MSGPACK_MEDIA_TYPE, headers=dict(response.headers))
+    if list_format == "columnar":
+        body = json.dumps(to_columns(adapter.dump_python(items, mode="json")), separators=(",", ":"))
+        return Response(body, media_type=COLUMNAR_MEDIA_TYPE, headers=dict(response.headers))
+    return json_response(adapter, items, response)
+
+# Delta sync helpers
+def encode_sync_token(changed_at: datetime, last_id: str) -> str:
+    payload = json.dumps([changed_at.isoformat(), last_id]).encode()
+    return base64.urlsafe_b64encode(payload).decode()
+
+def decode_sync_token(token: str):
+    try:
+        changed_at, last_id = json.loads(base64.urlsafe_b64decode(token.encode()))
+        changed_at = datetime.fromisoformat(changed_at)
+        if changed_at.tzinfo is None:
+            raise ValueError("token timestamp has no timezone")
+        return changed_at, last_id
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+
+async def write_tombstones(user_id: str, task_ids: List[str]):
+    """Record removed tasks so /tasks/sync can tell clients to drop them."""
+    if not task_ids:
+        return
+    deleted_at = datetime.now(timezone.utc)
+    await db.task_tombstones.bulk_write(
+        [UpdateOne({"id": task_id}, {"$set": {"user_id": user_id, "deleted_at": deleted_at}}, upsert=True)
+         for task_id in task_ids],
+        ordered=False
+    )
+
+# Conditional request helpers
+async def get_task_version(user_id: str) -> int:
+    doc = await db.task_versions.find_one({"user_id": user_id}, {"_id": 0, "version": 1})
+    return doc["version"] if doc else 0
+
+async def bump_task_version(user_id: str, changes: int = 1) -> int:
+    """Record that the user's tasks changed and return the new change version."""
+    doc = await db.task_versions.find_one_and_update(
+        {"user_id": user_id},
+        {"$inc": {"version": changes}},
+        projection={"_id": 0, "version": 1},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return doc["version"]
+
+def list_etag(user_id: str, version: int, request: Request) -> str:
+    params = sorted(request.query_params.multi_items())
+    list_format = negotiate_list_format(request.headers.get("accept"))
+    if list_format != "json":
+        params.append(("format", list_format))
+    digest = hashlib.sha1(f"{user_id}:{params}".encode()).hexdigest()[:16]
+    return f'"{version}.{digest}"'
+
+def task_etag(user_version: int, task_version: int) -> str:
+    return f'"{user_version}.{task_version}"'
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    candidates = [candidate.strip().removeprefix("W/") for candidate in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+def parse_if_match(if_match: str) -> int:
+    """Return the task version from an ETag produced by ``task_etag``.
+
+    A bare version number is also accepted.
+    """
+    try:
+        return int(if_match.strip().removeprefix("W/").strip('"').rsplit(".", 1)[-1])
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid If-Match header")
+
 # Authentication helper
 async def get_current_user(session_token: Optional[str] = Cookie(None), authorization: Optional[str] = Header(None)) -> User:
     # Try cookie first, then Authorization header
@@ -75,10 +1268,24 @@ async def get_current_user(session_token: Optional[str] = Cookie(None), authoriz
     if not token:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
-    # Find session
-    session = await db.user_sessions.find_one({"session_token": token})
-    if not session:
+    cached_user = session_cache.get(token)
+    if cached_user:
+        enforce_rate_limit(f"user:{cached_user.id}")
+        return cached_user
+    
+    # Unknown tokens are charged to the client IP before they reach Mongo
+    enforce_rate_limit(f"ip:{client_ip.get()}")
+    
+    # Resolve session and user in a single round trip
+    results = await db.user_sessions.aggregate([
+        {"$match": {"session_token": token}},
+        {"$limit": 1},
+        {"$lookup": {"from": "users", "localField": "user_id", "foreignField": "id", "as": "user"}},
+        {"$project": {"_id": 0, "expires_at": 1, "user": 1}},
+    ]).to_list(1)
+    if not results:
         raise HTTPException(status_code=401, detail="Invalid session")
+    session = results[0]
     
     # Check expiration
     expires_at = session['expires_at']
@@ -87,16 +1294,86 @@ async def get_current_user(session_token: Optional[str] = Cookie(None), authoriz
     if expires_at < datetime.now(timezone.utc):
         raise HTTPException(status_code=401, detail="Session expired")
     
-    # Get user
-    user_doc = await db.users.find_one({"id": session['user_id']}, {"_id": 0})
-    if not user_doc:
+    if not session['user']:
         raise HTTPException(status_code=404, detail="User not found")
+    user_doc = session['user'][0]
     
-    # Convert ISO strings to datetime
-    if isinstance(user_doc.get('created_at'), str):
-        user_doc['created_at'] = datetime.fromisoformat(user_doc['created_at'])
-    
-    return User(**user_doc)
+    user = User(**user_doc)
+    session_cache.set(token, user, expires_at)
+    enforce_rate_limit(f"user:{user.id}")
+    return user
+
+# Auth provider client
+http_client: Optional[httpx.AsyncClient] = None
+
+def create_http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(AUTH_PROVIDER_TIMEOUT, connect=AUTH_PROVIDER_CONNECT_TIMEOUT),
+        limits=httpx.Limits(max_connections=AUTH_PROVIDER_MAX_CONNECTIONS)
+    )
+
+async def fetch_session_data(session_id: str) -> dict:
+    """Exchange an auth provider session id for the user's session data.
+
+    Connection errors and 5xx responses are retried with exponential backoff.
+    """
+    for attempt in range(AUTH_PROVIDER_RETRIES + 1):
+        if attempt:
+            await asyncio.sleep(AUTH_PROVIDER_BACKOFF * 2 ** (attempt - 1))
+        started = time.monotonic()
+        try:
+            auth_response = await http_client.get(AUTH_PROVIDER_URL, headers={"X-Session-ID": session_id})
+        except httpx.TransportError:
+            metrics.observe("auth_provider_request_duration_seconds", time.monotonic() - started, {"outcome": "error"})
+            if attempt == AUTH_PROVIDER_RETRIES:
+                raise
+            continue
+        metrics.observe(
+            "auth_provider_request_duration_seconds",
+            time.monotonic() - started,
+            {"outcome": f"{auth_response.status_code // 100}xx"}
+        )
+        if auth_response.status_code >= 500 and attempt < AUTH_PROVIDER_RETRIES:
+            continue
+        auth_response.raise_for_status()
+        return auth_response.json()
+
+# Session cleanup
+session_reaper_stats = {"runs": 0, "deleted": 0, "last_run": None, "last_duration_ms": None}
+
+async def enforce_session_limit(user_id: str):
+    """Delete the user's oldest sessions beyond MAX_SESSIONS_PER_USER; values <= 0 mean no cap."""
+    if MAX_SESSIONS_PER_USER <= 0:
+        return
+    stale = await db.user_sessions.find(
+        {"user_id": user_id}, {"_id": 0, "session_token": 1}
+    ).sort("created_at", -1).skip(MAX_SESSIONS_PER_USER).to_list(None)
+    if not stale:
+        return
+    tokens = [session["session_token"] for session in stale]
+    for token in tokens:
+        await evict_session(token)
+    await db.user_sessions.delete_many({"session_token": {"$in": tokens}})
+
+async def reap_expired_sessions() -> int:
+    started = time.monotonic()
+    result = await db.user_sessions.delete_many({"expires_at": {"$lt": datetime.now(timezone.utc)}})
+    session_reaper_stats["runs"] += 1
+    session_reaper_stats["deleted"] += result.deleted_count
+    session_reaper_stats["last_run"] = datetime.now(timezone.utc).isoformat()
+    session_reaper_stats["last_duration_ms"] = round((time.monotonic() - started) * 1000, 2)
+    return result.deleted_count
+
+async def run_session_reaper():
+    """Periodically delete expired sessions where TTL indexes are unavailable."""
+    while True:
+        await asyncio.sleep(SESSION_REAPER_INTERVAL)
+        try:
+            deleted = await reap_expired_sessions()
+            if deleted:
+                logger.info("Reaped %d expired sessions", deleted)
+        except Exception:
+            logger.exception("Session reaper failed")
 
 # Auth endpoints
 @api_router.post("/auth/session")
@@ -106,13 +1383,7 @@ async def create_session(response: Response, x_session_id: str = Header(None, al
     
     # Get session data from Emergent Auth
     try:
-        auth_response = requests.get(
-            "https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data",
-            headers={"X-Session-ID": x_session_id},
-            timeout=10
-        )
-        auth_response.raise_for_status()
-        session_data = auth_response.json()
+        session_data = await fetch_session_data(x_session_id)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to get session data: {str(e)}")
     
@@ -127,9 +1398,7 @@ async def create_session(response: Response, x_session_id: str = Header(None, al
             name=session_data['name'],
             picture=session_data.get('picture')
         )
-        user_doc = user.model_dump()
-        user_doc['created_at'] = user_doc['created_at'].isoformat()
-        await db.users.insert_one(user_doc)
+        await db.users.insert_one(user.model_dump())
     else:
         user = User(**existing_user)
     
@@ -143,10 +1412,8 @@ async def create_session(response: Response, x_session_id: str = Header(None, al
         expires_at=expires_at
     )
     
-    session_doc = user_session.model_dump()
-    session_doc['created_at'] = session_doc['created_at'].isoformat()
-    session_doc['expires_at'] = session_doc['expires_at'].isoformat()
-    await db.user_sessions.insert_one(session_doc)
+    await db.user_sessions.insert_one(user_session.model_dump())
+    await enforce_session_limit(user.id)
     
     # Set cookie
     response.set_cookie(
@@ -168,6 +1435,7 @@ async def get_me(session_token: Optional[str] = Cookie(None), authorization: Opt
 @api_router.post("/auth/logout")
 async def logout(response: Response, session_token: Optional[str] = Cookie(None)):
     if session_token:
+        await evict_session(session_token)
         await db.user_sessions.delete_one({"session_token": session_token})
     
     response.delete_cookie(key="session_token", path="/", samesite="none", secure=True)
@@ -177,116 +1445,553 @@ async def logout(response: Response, session_token: Optional[str] = Cookie(None)
 @api_router.post("/tasks", response_model=Task)
 async def create_task(
     task_input: TaskCreate,
+    response: Response,
     session_token: Optional[str] = Cookie(None),
     authorization: Optional[str] = Header(None)
 ):
     user = await get_current_user(session_token, authorization)
     
-    task = Task(
-        user_id=user.id,
-        title=task_input.title,
-        description=task_input.description,
-        due_date=task_input.due_date,
-        priority=task_input.priority
-    )
-    
-    task_doc = task.model_dump()
-    task_doc['created_at'] = task_doc['created_at'].isoformat()
-    task_doc['updated_at'] = task_doc['updated_at'].isoformat()
-    if task_doc['due_date']:
-        task_doc['due_date'] = task_doc['due_date'].isoformat()
+    task = Task(user_id=user.id, **task_input.model_dump())
     
+    task_doc = task_document(task)
     await db.tasks.insert_one(task_doc)
-    return task
+    await adjust_task_counters(user.id, after=task_doc)
+    version = await bump_task_version(user.id)
+    await publish_task_event(user.id, "created", task.id, task.model_dump(mode="json"), version)
+    return task_response(task_doc, response)
+
+@api_router.post("/tasks/bulk")
+async def bulk_tasks(
+    bulk: TaskBulkRequest,
+    session_token: Optional[str] = Cookie(None),
+    authorization: Optional[str] = Header(None)
+):
+    user = await get_current_user(session_token, authorization)
+    
+    # Resolve ownership of every referenced task in one query
+    referenced_ids = [operation.id for operation in bulk.operations if operation.op != "create"]
+    owned_ids = set()
+    if referenced_ids:
+        owned = await db.tasks.find(
+            {"user_id": user.id, "id": {"$in": referenced_ids}}, {"_id": 0, "id": 1}
+        ).to_list(None)
+        owned_ids = {doc["id"] for doc in owned}
+    
+    results = []
+    write_requests = []
+    write_indexes = []
+    write_events = {}
+    failed = False
+    for index, operation in enumerate(bulk.operations):
+        result = {"index": index, "op": operation.op, "id": operation.id}
+        results.append(result)
+        if failed and bulk.ordered:
+            result["status"] = "skipped"
+            continue
+        try:
+            if operation.op == "create":
+                task = Task(user_id=user.id, **TaskCreate(**operation.data).model_dump())
+                result["id"] = task.id
+                write_requests.append(InsertOne(task_document(task)))
+                write_events[index] = ("created", task.id, task.model_dump(mode="json"))
+            elif operation.id not in owned_ids:
+                result.update(status="error", error="Task not found")
+                failed = True
+                continue
+            elif operation.op == "update":
+                update_data = task_update_document(TaskUpdate(**operation.data))
+                write_requests.append(UpdateOne(
+                    {"id": operation.id, "user_id": user.id},
+                    {"$set": update_data, "$inc": {"version": 1}}
+                ))
+                write_events[index] = ("updated", operation.id, None)
+            else:
+                write_requests.append(DeleteOne({"id": operation.id, "user_id": user.id}))
+                write_events[index] = ("deleted", operation.id, None)
+        except ValidationError as e:
+            result.update(status="error", error=e.errors(include_url=False, include_context=False))
+            failed = True
+            continue
+        result["status"] = "ok"
+        write_indexes.append(index)
+    
+    summary = {"nInserted": 0, "nModified": 0, "nRemoved": 0}
+    if write_requests:
+        try:
+            outcome = await db.tasks.bulk_write(write_requests, ordered=bulk.ordered)
+            summary = outcome.bulk_api_result
+        except BulkWriteError as e:
+            summary = e.details
+            for error in summary["writeErrors"]:
+                results[write_indexes[error["index"]]].update(status="error", error=error["errmsg"])
+            if bulk.ordered:
+                first_error = summary["writeErrors"][0]["index"]
+                for index in write_indexes[first_error + 1:]:
+                    results[index]["status"] = "skipped"
+        if TASK_COUNTERS_ENABLED:
+            await resync_task_counters(user.id)
+        applied = [event for index, event in write_events.items() if results[index]["status"] == "ok"]
+        if applied:
+            # Reserve one change version per applied operation
+            version = await bump_task_version(user.id, len(applied))
+            for event_id, (event_type, task_id, task) in enumerate(applied, start=version - len(applied) + 1):
+                await publish_task_event(user.id, event_type, task_id, task, event_id)
+            await write_tombstones(user.id, [task_id for event_type, task_id, _ in applied if event_type == "deleted"])
+    
+    return {
+        "results": results,
+        "inserted": summary["nInserted"],
+        "modified": summary["nModified"],
+        "deleted": summary["nRemoved"],
+    }
 
 @api_router.get("/tasks", response_model=List[Task])
 async def get_tasks(
+    request: Request,
+    response: Response,
     status: Optional[str] = None,
     priority: Optional[str] = None,
+    due_before: Optional[datetime] = None,
+    due_after: Optional[datetime] = None,
+    sort: Literal["due_date", "priority", "created_at", "updated_at"] = "created_at",
+    order: Literal["asc", "desc"] = "asc",
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    include_archived: bool = False,
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
     session_token: Optional[str] = Cookie(None),
     authorization: Optional[str] = Header(None)
 ):
     user = await get_current_user(session_token, authorization)
+    selected = parse_fields(fields)
+    
+    etag = list_etag(user.id, await get_task_version(user.id), request)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
     
     query = {"user_id": user.id}
     if status:
         query["status"] = status
     if priority:
         query["priority"] = priority
+    if due_before or due_after:
+        query["due_date"] = {}
+        if due_after:
+            query["due_date"]["$gte"] = due_after
+        if due_before:
+            query["due_date"]["$lt"] = due_before
     
-    tasks = await db.tasks.find(query, {"_id": 0}).to_list(1000)
+    projection = fields_projection(selected, [SORT_FIELDS[sort]])
+    tasks = await find_task_page("tasks", query, sort, order, limit, cursor, projection, include_archived)
+    if len(tasks) > limit:
+        tasks = tasks[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(sort, order, tasks[-1])
     
-    # Convert ISO strings to datetime objects
-    for task in tasks:
-        if isinstance(task.get('created_at'), str):
-            task['created_at'] = datetime.fromisoformat(task['created_at'])
-        if isinstance(task.get('updated_at'), str):
-            task['updated_at'] = datetime.fromisoformat(task['updated_at'])
-        if isinstance(task.get('due_date'), str):
-            task['due_date'] = datetime.fromisoformat(task['due_date'])
+    if selected:
+        return list_response(partial_task_list_adapter, [select_fields(task, selected) for task in tasks], response, accept)
+    return task_list_response(tasks, response, accept)
+
+def json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+async def export_ndjson(cursor):
+    lines = []
+    async for doc in cursor:
+        lines.append(json.dumps(doc, default=json_default))
+        if len(lines) >= EXPORT_BATCH_SIZE:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+async def export_csv(cursor):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    rows = 0
+    async for doc in cursor:
+        writer.writerow({
+            key: value.isoformat() if isinstance(value, datetime) else value
+            for key, value in doc.items()
+        })
+        rows += 1
+        if rows >= EXPORT_BATCH_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            rows = 0
+    yield buffer.getvalue()
+
+@api_router.get("/tasks/export")
+async def export_tasks(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    session_token: Optional[str] = Cookie(None),
+    authorization: Optional[str] = Header(None)
+):
+    user = await get_current_user(session_token, authorization)
+    
+    projection = {"_id": 0, **{field: 1 for field in EXPORT_FIELDS}}
+    cursor = db.tasks.find({"user_id": user.id}, projection).sort(
+        [("created_at", 1), ("id", 1)]
+    ).batch_size(EXPORT_BATCH_SIZE)
+    
+    if format == "csv":
+        body, media_type = export_csv(cursor), "text/csv"
+    else:
+        body, media_type = export_ndjson(cursor), "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="tasks.{format}"'}
+    )
+
+@api_router.get("/tasks/stream")
+async def stream_task_events(
+    request: Request,
+    last_event_id: Optional[str] = Header(None),
+    session_token: Optional[str] = Cookie(None),
+    authorization: Optional[str] = Header(None)
+):
+    user = await get_current_user(session_token, authorization)
     
+    # EventSource cannot set headers on the first connection, so accept a query param too
+    resume_from = last_event_id or request.query_params.get("last_event_id") or None
+    if resume_from and not TASK_CHANGE_STREAM_ENABLED:
+        try:
+            resume_from = int(resume_from)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid Last-Event-ID")
+    queue, missed = task_events.subscribe(user.id, resume_from)
+    
+    async def event_stream():
+        try:
+            yield "retry: 3000\n\n"
+            for event in missed:
+                yield format_task_event(event)
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_task_event(event)
+        finally:
+            task_events.unsubscribe(user.id, queue)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def text_search(user_id: str, terms: List[str], prefix: bool, window: int) -> List[dict]:
+    """Rank matches with the text index, best first, up to ``window`` tasks.
+
+    Quoted complete terms must all match. With ``prefix`` the last term may
+    be the start of a word: exact words still rank through textScore, and
+    the indexed ``*_terms`` fields narrow matches with an anchored regex.
+    """
+    complete, partial = (terms[:-1], terms[-1]) if prefix else (terms, None)
+    search = " ".join([f'"{term}"' for term in complete] + ([partial] if partial else []))
+    prefix_match = None
+    if partial:
+        pattern = {"$regex": f"^{re.escape(partial)}"}
+        prefix_match = {"$or": [{terms_field: pattern} for terms_field in SEARCH_TERM_FIELDS.values()]}
+    
+    text_query = {"user_id": user_id, "$text": {"$search": search}}
+    if complete and prefix_match:
+        text_query.update(prefix_match)
+    tasks = await db.tasks.find(text_query, {"_id": 0, "score": {"$meta": "textScore"}}).sort(
+        [("score", {"$meta": "textScore"})]
+    ).limit(window).to_list(window)
+    
+    # A lone partial word only hits exact words in $text; list other prefix matches after them
+    if prefix_match and not complete and len(tasks) < window:
+        found = [task["id"] for task in tasks]
+        tasks += await db.tasks.find(
+            {"user_id": user_id, "id": {"$nin": found}, **prefix_match}, {"_id": 0}
+        ).sort([("updated_at", -1)]).limit(window - len(tasks)).to_list(window - len(tasks))
     return tasks
 
+@api_router.get("/tasks/search", response_model=List[Task])
+async def search_tasks(
+    response: Response,
+    q: str = Query(..., min_length=1),
+    prefix: bool = True,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    accept: Optional[str] = Header(None),
+    session_token: Optional[str] = Cookie(None),
+    authorization: Optional[str] = Header(None)
+):
+    user = await get_current_user(session_token, authorization)
+    
+    terms = tokenize(q)
+    # Results are only ranked within a bounded window
+    limit = min(limit, SEARCH_MAX_RESULTS - offset)
+    if not terms or limit <= 0:
+        return []
+    
+    if SEARCH_BACKEND == "memory":
+        index = await get_search_index(user.id)
+        task_ids = index.search(terms, prefix)[offset:offset + limit + 1]
+        docs = await db.tasks.find({"user_id": user.id, "id": {"$in": task_ids}}, {"_id": 0}).to_list(None)
+        docs_by_id = {doc["id"]: doc for doc in docs}
+        tasks = [docs_by_id[task_id] for task_id in task_ids if task_id in docs_by_id]
+    else:
+        tasks = await text_search(user.id, terms, prefix, offset + limit + 1)
+        tasks = tasks[offset:]
+    
+    if len(tasks) > limit:
+        tasks = tasks[:limit]
+        if offset + limit < SEARCH_MAX_RESULTS:
+            response.headers["X-Next-Offset"] = str(offset + limit)
+    return task_list_response(tasks, response, accept)
+
+@api_router.get("/tasks/agenda", response_model=TaskAgenda)
+async def get_task_agenda(
+    response: Response,
+    days: int = Query(7, ge=1, le=90),
+    tz: str = "UTC",
+    session_token: Optional[str] = Cookie(None),
+    authorization: Optional[str] = Header(None)
+):
+    user = await get_current_user(session_token, authorization)
+    
+    try:
+        zone = ZoneInfo(tz)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise HTTPException(status_code=400, detail="Unknown time zone")
+    today = datetime.now(zone).replace(hour=0, minute=0, second=0, microsecond=0)
+    tomorrow = today + timedelta(days=1)
+    end = tomorrow + timedelta(days=days)
+    
+    # Each bucket is capped on its own so old overdue tasks cannot crowd out the rest
+    buckets = {
+        "overdue": {"$lt": today},
+        "today": {"$gte": today, "$lt": tomorrow},
+        "upcoming": {"$gte": tomorrow},
+    }
+    results = await db.tasks.aggregate([
+        # An equality match on status lets the (user_id, status, due_date, id) index supply the sort
+        {"$match": {"user_id": user.id, "status": "pending", "due_date": {"$lt": end}}},
+        {"$sort": {"due_date": 1, "id": 1}},
+        {"$project": {"_id": 0}},
+        {"$facet": {
+            bucket: [{"$match": {"due_date": due_date}}, {"$limit": AGENDA_MAX_TASKS + 1}]
+            for bucket, due_date in buckets.items()
+        }},
+    ]).to_list(1)
+    
+    agenda = {}
+    truncated = []
+    for bucket, tasks in results[0].items():
+        if len(tasks) > AGENDA_MAX_TASKS:
+            tasks = tasks[:AGENDA_MAX_TASKS]
+            truncated.append(bucket)
+        agenda[bucket] = [with_task_defaults(task) for task in tasks]
+    if truncated:
+        response.headers["X-Agenda-Truncated"] = ",".join(truncated)
+    return json_response(task_agenda_adapter, agenda, response)
+
+@api_router.get("/tasks/archive", response_model=List[Task])
+async def get_archived_tasks(
+    request: Request,
+    response: Response,
+    sort: Literal["due_date", "priority", "created_at", "updated_at"] = "updated_at",
+    order: Literal["asc", "desc"] = "desc",
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    session_token: Optional[str] = Cookie(None),
+    authorization: Optional[str] = Header(None)
+):
+    user = await get_current_user(session_token, authorization)
+    selected = parse_fields(fields)
+    
+    etag = list_etag(user.id, await get_task_version(user.id), request)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    
+    projection = fields_projection(selected, [SORT_FIELDS[sort]])
+    tasks = await find_task_page("tasks_archive", {"user_id": user.id}, sort, order, limit, cursor, projection)
+    if len(tasks) > limit:
+        tasks = tasks[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(sort, order, tasks[-1])
+    
+    if selected:
+        return list_response(partial_task_list_adapter, [select_fields(task, selected) for task in tasks], response, accept)
+    return list_response(archived_task_list_adapter, [with_task_defaults(task) for task in tasks], response, accept)
+
+@api_router.get("/tasks/sync", response_model=TaskSync)
+async def sync_tasks(
+    response: Response,
+    since: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=1000),
+    session_token: Optional[str] = Cookie(None),
+    authorization: Optional[str] = Header(None)
+):
+    """Return tasks changed and ids deleted since ``since``, with the token for the next call.
+
+    Without ``since`` every live task is returned. Follow ``token`` while
+    ``has_more`` is true.
+    """
+    user = await get_current_user(session_token, authorization)
+    
+    now = datetime.now(timezone.utc)
+    task_query = {"user_id": user.id}
+    tombstones = []
+    if since:
+        changed_at, last_id = decode_sync_token(since)
+        if changed_at < now - timedelta(days=SYNC_TOMBSTONE_TTL_DAYS):
+            raise HTTPException(status_code=410, detail="Sync token expired, fetch all tasks again")
+        task_query = {"$and": [task_query, keyset_filter("updated_at", changed_at, last_id, "asc")]}
+        tombstone_query = {"$and": [{"user_id": user.id}, keyset_filter("deleted_at", changed_at, last_id, "asc")]}
+        tombstones = await db.task_tombstones.find(tombstone_query, {"_id": 0}).sort(
+            [("deleted_at", 1), ("id", 1)]
+        ).limit(limit + 1).to_list(limit + 1)
+    tasks = await db.tasks.find(task_query, {"_id": 0}).sort(
+        [("updated_at", 1), ("id", 1)]
+    ).limit(limit + 1).to_list(limit + 1)
+    
+    # Merge updates and deletions into one (time, id) ordered change list
+    changes = sorted(
+        [(task["updated_at"], task["id"], task) for task in tasks]
+        + [(tombstone["deleted_at"], tombstone["id"], None) for tombstone in tombstones],
+        key=lambda change: change[:2]
+    )
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    if has_more:
+        token = encode_sync_token(*changes[-1][:2])
+    else:
+        # Step back so writes still in flight during this read are sent next time
+        token = encode_sync_token(now - timedelta(seconds=SYNC_OVERLAP_SECONDS), "")
+    
+    return json_response(task_sync_adapter, {
+        "tasks": [with_task_defaults(task) for _, _, task in changes if task],
+        "deleted": [task_id for _, task_id, task in changes if not task],
+        "token": token,
+        "has_more": has_more,
+    }, response)
+
+@api_router.get("/tasks/stats")
+async def get_task_stats(
+    session_token: Optional[str] = Cookie(None),
+    authorization: Optional[str] = Header(None)
+):
+    user = await get_current_user(session_token, authorization)
+    
+    now = datetime.now(timezone.utc)
+    open_tasks = {"status": {"$ne": "completed"}}
+    overdue = {**open_tasks, "due_date": {"$lt": now}}
+    due_this_week = {**open_tasks, "due_date": {"$gte": now, "$lt": now + timedelta(days=7)}}
+    
+    if TASK_COUNTERS_ENABLED:
+        counters = await db.task_counters.find_one({"user_id": user.id}, {"_id": 0, "user_id": 0})
+        if not counters:
+            counters = await seed_task_counters(user.id)
+        return {
+            **counters,
+            "overdue": await db.tasks.count_documents({"user_id": user.id, **overdue}),
+            "due_this_week": await db.tasks.count_documents({"user_id": user.id, **due_this_week}),
+        }
+    
+    results = await db.tasks.aggregate([
+        {"$match": {"user_id": user.id}},
+        {"$facet": {
+            "by_status": [{"$group": {"_id": "$status", "count": {"$sum": 1}}}],
+            "by_priority": [{"$group": {"_id": "$priority", "count": {"$sum": 1}}}],
+            "overdue": [{"$match": overdue}, {"$count": "count"}],
+            "due_this_week": [{"$match": due_this_week}, {"$count": "count"}],
+        }},
+    ]).to_list(1)
+    facets = results[0]
+    by_status = {group["_id"]: group["count"] for group in facets["by_status"]}
+    return {
+        "total": sum(by_status.values()),
+        "by_status": by_status,
+        "by_priority": {group["_id"]: group["count"] for group in facets["by_priority"]},
+        "overdue": facets["overdue"][0]["count"] if facets["overdue"] else 0,
+        "due_this_week": facets["due_this_week"][0]["count"] if facets["due_this_week"] else 0,
+    }
+
 @api_router.get("/tasks/{task_id}", response_model=Task)
 async def get_task(
     task_id: str,
+    response: Response,
+    fields: Optional[str] = None,
+    include_archived: bool = False,
+    if_none_match: Optional[str] = Header(None),
     session_token: Optional[str] = Cookie(None),
     authorization: Optional[str] = Header(None)
 ):
     user = await get_current_user(session_token, authorization)
+    selected = parse_fields(fields)
     
-    task = await db.tasks.find_one({"id": task_id, "user_id": user.id}, {"_id": 0})
+    user_version = await get_task_version(user.id)
+    projection = fields_projection(selected, ["version"])
+    task = await db.tasks.find_one({"id": task_id, "user_id": user.id}, projection)
+    if not task and include_archived:
+        task = await db.tasks_archive.find_one({"id": task_id, "user_id": user.id}, projection)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    # Convert ISO strings
-    if isinstance(task.get('created_at'), str):
-        task['created_at'] = datetime.fromisoformat(task['created_at'])
-    if isinstance(task.get('updated_at'), str):
-        task['updated_at'] = datetime.fromisoformat(task['updated_at'])
-    if isinstance(task.get('due_date'), str):
-        task['due_date'] = datetime.fromisoformat(task['due_date'])
-    
-    return Task(**task)
+    etag = task_etag(user_version, task.get("version", 1))
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    if selected:
+        return json_response(partial_task_adapter, select_fields(task, selected), response)
+    return task_response(task, response)
 
 @api_router.put("/tasks/{task_id}", response_model=Task)
 async def update_task(
     task_id: str,
     task_update: TaskUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     session_token: Optional[str] = Cookie(None),
     authorization: Optional[str] = Header(None)
 ):
     user = await get_current_user(session_token, authorization)
     
-    # Check task exists and belongs to user
-    existing_task = await db.tasks.find_one({"id": task_id, "user_id": user.id}, {"_id": 0})
-    if not existing_task:
-        raise HTTPException(status_code=404, detail="Task not found")
-    
-    # Update fields
-    update_data = task_update.model_dump(exclude_unset=True)
-    update_data['updated_at'] = datetime.now(timezone.utc).isoformat()
+    query = {"id": task_id, "user_id": user.id}
+    if if_match and if_match.strip() != "*":
+        expected_version = parse_if_match(if_match)
+        # Tasks written before versioning have no field and count as version 1
+        query["version"] = {"$in": [expected_version, None]} if expected_version == 1 else expected_version
     
-    if 'due_date' in update_data and update_data['due_date']:
-        update_data['due_date'] = update_data['due_date'].isoformat()
-    
-    await db.tasks.update_one(
-        {"id": task_id, "user_id": user.id},
-        {"$set": update_data}
+    # Update the task in one atomic round trip and derive the post-image
+    update_data = task_update_document(task_update)
+    previous_task = await db.tasks.find_one_and_update(
+        query,
+        {"$set": update_data, "$inc": {"version": 1}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.BEFORE
     )
+    if not previous_task:
+        if "version" in query and await db.tasks.count_documents({"id": task_id, "user_id": user.id}, limit=1):
+            raise HTTPException(status_code=412, detail="Task was modified by another request")
+        raise HTTPException(status_code=404, detail="Task not found")
     
-    # Get updated task
-    updated_task = await db.tasks.find_one({"id": task_id}, {"_id": 0})
-    
-    # Convert ISO strings
-    if isinstance(updated_task.get('created_at'), str):
-        updated_task['created_at'] = datetime.fromisoformat(updated_task['created_at'])
-    if isinstance(updated_task.get('updated_at'), str):
-        updated_task['updated_at'] = datetime.fromisoformat(updated_task['updated_at'])
-    if isinstance(updated_task.get('due_date'), str):
-        updated_task['due_date'] = datetime.fromisoformat(updated_task['due_date'])
+    updated_task = {**previous_task, **update_data, "version": previous_task.get("version", 1) + 1}
+    await adjust_task_counters(user.id, before=previous_task, after=updated_task)
+    user_version = await bump_task_version(user.id)
+    await publish_task_event(
+        user.id, "updated", task_id, task_adapter.dump_python(with_task_defaults(updated_task), mode="json"), user_version
+    )
     
-    return Task(**updated_task)
+    response.headers["ETag"] = task_etag(user_version, updated_task["version"])
+    return task_response(updated_task, response)
 
 @api_router.delete("/tasks/{task_id}")
 async def delete_task(
@@ -296,29 +2001,487 @@ async def delete_task(
 ):
     user = await get_current_user(session_token, authorization)
     
-    result = await db.tasks.delete_one({"id": task_id, "user_id": user.id})
-    if result.deleted_count == 0:
+    deleted_task = await db.tasks.find_one_and_delete(
+        {"id": task_id, "user_id": user.id},
+        projection={"_id": 0, "status": 1, "priority": 1}
+    )
+    if not deleted_task:
         raise HTTPException(status_code=404, detail="Task not found")
+    await adjust_task_counters(user.id, before=deleted_task)
+    await write_tombstones(user.id, [task_id])
+    version = await bump_task_version(user.id)
+    await publish_task_event(user.id, "deleted", task_id, event_id=version)
     
     return {"message": "Task deleted successfully"}
 
+# Response compression
+class GzipEncoder:
+    def __init__(self):
+        self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+class BrotliEncoder:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.finish()
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    accepted = header_qualities(accept_encoding)
+    for coding in (["br"] if brotli else []) + ["gzip"]:
+        if accepted.get(coding, accepted.get("*", 0)) > 0:
+            return coding
+    return None
+
+class CompressionMiddleware:
+    """Compress responses with Brotli or gzip, as negotiated by Accept-Encoding.
+
+    Complete bodies under ``minimum_size`` are sent as-is. Streamed bodies are
+    flushed after every chunk so exports and Server-Sent Events are not held back.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"))
+        if not encoding:
+            await self.app(scope, receive, send)
+            return
+        
+        start_message = None
+        encoder = None
+        
+        async def send_compressed(message):
+            nonlocal start_message, encoder
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            
+            if start_message is None:
+                if encoder:
+                    body = encoder.chunk(body) if more_body else encoder.finish(body)
+                    message = {"type": "http.response.body", "body": body, "more_body": more_body}
+                await send(message)
+                return
+            
+            start, start_message = start_message, None
+            headers = MutableHeaders(raw=start["headers"])
+            content_type = headers.get("content-type", "")
+            if (
+                "content-encoding" in headers
+                or not content_type.startswith(COMPRESSIBLE_TYPES)
+                or (not more_body and len(body) < self.minimum_size)
+            ):
+                await send(start)
+                await send(message)
+                return
+            
+            encoder = BrotliEncoder() if encoding == "br" else GzipEncoder()
+            headers["Content-Encoding"] = encoding
+            headers.add_vary_header("Accept-Encoding")
+            # The compressed bytes differ from the identity ones, so a strong ETag no longer applies
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = f"W/{etag}"
+            if more_body:
+                del headers["content-length"]
+                body = encoder.chunk(body)
+            else:
+                body = encoder.finish(body)
+                headers["Content-Length"] = str(len(body))
+            await send(start)
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+        
+        await self.app(scope, receive, send_compressed)
+
 # Include router
 app.include_router(api_router)
 
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+in_flight_by_class = Counter()
+
+def shed(reason: str, detail: str) -> JSONResponse:
+    metrics.inc("load_shed_total", {"reason": reason})
+    return JSONResponse({"detail": detail}, status_code=503, headers={"Retry-After": str(SHED_RETRY_AFTER)})
+
+class LoadLimitMiddleware:
+    """Rate limit by client IP and shed load by Mongo pressure and route class.
+
+    Written as plain ASGI so a request holds its route-class slot until the
+    last body chunk is sent, which for exports and event streams is long
+    after the response starts.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request = Request(scope)
+        if request.url.path in UNLIMITED_PATHS or request.method == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+        
+        ip = request.client.host if request.client else "unknown"
+        client_ip.set(ip)
+        # Other requests with a token are limited per user, or per IP on a session lookup, in get_current_user
+        has_token = request.cookies.get("session_token") or request.headers.get("Authorization", "").startswith("Bearer ")
+        if RATE_LIMIT_ENABLED and (not has_token or request.url.path in IP_LIMITED_PATHS):
+            wait = rate_limiter.acquire(f"ip:{ip}")
+            if wait:
+                metrics.inc("rate_limited_total", {"key": "ip"})
+                response = JSONResponse(
+                    {"detail": "Too many requests"}, status_code=429, headers={"Retry-After": str(max(1, round(wait)))}
+                )
+                await response(scope, receive, send)
+                return
+        
+        if MONGO_IN_FLIGHT_LIMIT and mongo_commands.in_flight + mongo_pool.waiting >= MONGO_IN_FLIGHT_LIMIT:
+            await shed("mongo", "Database is overloaded, retry later")(scope, receive, send)
+            return
+        request_class = route_class(request)
+        if in_flight_by_class[request_class] >= CONCURRENCY_LIMITS[request_class]:
+            await shed(request_class, "Server is busy, retry later")(scope, receive, send)
+            return
+        
+        in_flight_by_class[request_class] += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            in_flight_by_class[request_class] -= 1
+
+class RequestMetricsMiddleware:
+    """Count requests and time them until the response body is complete."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        metrics.add("http_requests_in_flight", 1)
+        started = time.monotonic()
+        status = 500
+        
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            metrics.add("http_requests_in_flight", -1)
+            route = scope.get("route")
+            labels = {"method": scope["method"], "route": route.path if route else "unmatched"}
+            metrics.observe("http_request_duration_seconds", time.monotonic() - started, labels)
+            metrics.inc("http_requests_total", {**labels, "status": status})
+
+app.add_middleware(LoadLimitMiddleware)
+app.add_middleware(RequestMetricsMiddleware)
+
+@app.middleware("http")
+async def profile_request(request: Request, call_next):
+    token = request.headers.get("X-Profile")
+    if not (PROFILING_ENABLED and PROFILING_TOKEN and token and hmac.compare_digest(token, PROFILING_TOKEN)):
+        return await call_next(request)
+    
+    with RequestProfile(PROFILING_INTERVAL) as profile:
+        response = await call_next(request)
+    route = request.scope.get("route")
+    slug = re.sub(r"\W+", "_", route.path if route else request.url.path).strip("_")
+    name = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S%f}-{request.method}-{slug}"
+    profile.write(name)
+    logger.info("Profiled %s %s: %s", request.method, request.url.path, profile.summary())
+    response.headers["X-Profile-Id"] = name
+    return response
+
+# Registered last so it is outermost and also covers 429/503 responses from LoadLimitMiddleware
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Next-Offset", "ETag", "Retry-After", "X-Agenda-Truncated"],
 )
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
+@app.get("/metrics")
+async def get_metrics():
+    cache_stats = session_cache.stats()
+    metrics.set("session_cache_size", cache_stats["size"])
+    metrics.set("session_cache_hits", cache_stats["hits"])
+    metrics.set("session_cache_misses", cache_stats["misses"])
+    metrics.set("session_reaper_runs", session_reaper_stats["runs"])
+    metrics.set("session_reaper_deleted", session_reaper_stats["deleted"])
+    if session_reaper_stats["last_duration_ms"] is not None:
+        metrics.set("session_reaper_last_duration_ms", session_reaper_stats["last_duration_ms"])
+    metrics.set("mongo_commands_in_flight", mongo_commands.in_flight)
+    metrics.set("mongo_connections_waiting", mongo_pool.waiting)
+    metrics.set("tasks_archived", task_archive_stats["archived"])
+    for request_class, count in in_flight_by_class.items():
+        metrics.set("http_requests_in_flight_by_class", count, {"class": request_class})
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# Indexes
+HOT_QUERIES = [
+    ("tasks", {"user_id": "", "status": "pending", "priority": "medium"}),
+    ("tasks", {"id": "", "user_id": ""}),
+    ("tasks", {"user_id": "", "status": "pending", "due_date": {"$lt": datetime.now(timezone.utc)}}),
+    ("tasks", {"user_id": "", "updated_at": {"$gt": datetime.now(timezone.utc)}}),
+    ("users", {"email": ""}),
+    ("user_sessions", {"session_token": ""}),
+]
+
+async def ensure_indexes():
+    await db.tasks.create_index([("user_id", 1), ("status", 1), ("priority", 1)])
+    await db.tasks.create_index([("user_id", 1), ("status", 1), ("due_date", 1), ("id", 1)])
+    await db.tasks.create_index("id", unique=True)
+    for terms_field in SEARCH_TERM_FIELDS.values():
+        await db.tasks.create_index([("user_id", 1), (terms_field, 1)])
+    if SEARCH_BACKEND == "mongo":
+        await db.tasks.create_index(
+            [("user_id", 1), ("title", "text"), ("description", "text")],
+            weights=SEARCH_FIELD_WEIGHTS,
+            default_language="none",
+            name="tasks_text"
+        )
+    for field in SORT_FIELDS.values():
+        if field != "created_at":
+            await db.tasks.create_index([("user_id", 1), (field, 1), ("id", 1)])
+        await db.tasks_archive.create_index([("user_id", 1), (field, 1), ("id", 1)])
+    await db.tasks_archive.create_index("id", unique=True)
+    await db.task_tombstones.create_index("id", unique=True)
+    await db.task_tombstones.create_index([("user_id", 1), ("deleted_at", 1), ("id", 1)])
+    await db.task_tombstones.create_index("deleted_at", expireAfterSeconds=SYNC_TOMBSTONE_TTL_DAYS * 86400)
+    # Lets the archival job find completed tasks without scanning live ones
+    await db.tasks.create_index([("status", 1), ("updated_at", 1)])
+    # Covers the default list view: sort=created_at with fields=LIST_VIEW_FIELDS
+    await db.tasks.create_index(
+        [("user_id", 1), ("created_at", 1), ("id", 1)] + [(field, 1) for field in LIST_VIEW_FIELDS if field != "id"]
+    )
+    await db.users.create_index("id", unique=True)
+    await db.users.create_index("email", unique=True)
+    await db.user_sessions.create_index("session_token", unique=True)
+    await db.task_counters.create_index("user_id", unique=True)
+    await db.task_versions.create_index("user_id", unique=True)
+    await db.user_sessions.create_index("expires_at", expireAfterSeconds=0)
+    await db.user_sessions.create_index([("user_id", 1), ("created_at", -1)])
+
+def plan_stages(plan: dict) -> List[str]:
+    plan = plan.get("queryPlan", plan)
+    stages = [plan.get("stage")]
+    if "inputStage" in plan:
+        stages += plan_stages(plan["inputStage"])
+    for child in plan.get("inputStages", []):
+        stages += plan_stages(child)
+    return stages
+
+async def log_query_plans():
+    for collection, query in HOT_QUERIES:
+        explanation = await db[collection].find(query).explain()
+        stages = plan_stages(explanation["queryPlanner"]["winningPlan"])
+        if "IXSCAN" in stages:
+            logger.info("Query on %s %s uses IXSCAN", collection, list(query))
+        else:
+            logger.warning("Query on %s %s does not use an index: %s", collection, list(query), stages)
+
+# Date migration
+DATE_FIELDS = {
+    "tasks": ["created_at", "updated_at", "due_date"],
+    "users": ["created_at"],
+    "user_sessions": ["created_at", "expires_at"],
+}
+MIGRATION_BATCH_SIZE = 500
+
+async def migrate_string_dates():
+    """Convert ISO string timestamps left by older releases into BSON dates."""
+    for collection, fields in DATE_FIELDS.items():
+        query = {"$or": [{field: {"$type": "string"}} for field in fields]}
+        projection = {field: 1 for field in fields}
+        migrated = 0
+        while True:
+            docs = await db[collection].find(query, projection).to_list(MIGRATION_BATCH_SIZE)
+            if not docs:
+                break
+            operations = []
+            for doc in docs:
+                updates = {
+                    field: datetime.fromisoformat(doc[field])
+                    for field in fields
+                    if isinstance(doc.get(field), str)
+                }
+                operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": updates}))
+            await db[collection].bulk_write(operations, ordered=False)
+            migrated += len(operations)
+        if migrated:
+            logger.info("Migrated %d %s documents to native dates", migrated, collection)
+
+async def backfill_priority_rank():
+    for priority, rank in PRIORITY_RANK.items():
+        await db.tasks.update_many(
+            {"priority": priority, "priority_rank": {"$exists": False}},
+            {"$set": {"priority_rank": rank}}
+        )
+
+async def backfill_search_terms():
+    projection = {field: 1 for field in SEARCH_TERM_FIELDS}
+    while True:
+        docs = await db.tasks.find({"title_terms": {"$exists": False}}, projection).to_list(MIGRATION_BATCH_SIZE)
+        if not docs:
+            break
+        await db.tasks.bulk_write(
+            [UpdateOne({"_id": doc["_id"]}, {"$set": search_terms({"description": None, **doc})}) for doc in docs],
+            ordered=False
+        )
+
+async def migrate_task_documents():
+    await migrate_string_dates()
+    await backfill_priority_rank()
+    await backfill_search_terms()
+
+# Task archival
+task_archive_stats = {"archived": 0, "last_run": None}
+
+async def archive_completed_tasks() -> int:
+    """Move completed tasks not updated for ARCHIVE_AFTER_DAYS into tasks_archive.
+
+    Tasks are copied before they are deleted, so an interrupted batch is
+    simply copied again on the next run. Every worker runs this job, and
+    overlapping runs are safe because each task is deleted exactly once.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(days=ARCHIVE_AFTER_DAYS)
+    query = {"status": "completed", "updated_at": {"$lt": cutoff}}
+    archived = 0
+    while True:
+        tasks = await db.tasks.find(query, {"_id": 0}).sort("updated_at", 1).to_list(ARCHIVE_BATCH_SIZE)
+        if not tasks:
+            break
+        archived_at = datetime.now(timezone.utc)
+        await db.tasks_archive.bulk_write(
+            [ReplaceOne({"id": task["id"]}, {**task, "archived_at": archived_at}, upsert=True) for task in tasks],
+            ordered=False
+        )
+        # Only tasks this run deleted count as moved: edited tasks no longer
+        # match, and another worker may have archived the same batch first
+        limit = asyncio.Semaphore(max(1, ARCHIVE_DELETE_CONCURRENCY))
+        
+        async def delete_archived(task):
+            async with limit:
+                return await db.tasks.find_one_and_delete(
+                    {"id": task["id"], "status": "completed", "updated_at": task["updated_at"]},
+                    projection={"_id": 0, "id": 1}
+                )
+        
+        deleted = await asyncio.gather(*(delete_archived(task) for task in tasks))
+        ids = [task["id"] for task in tasks]
+        still_live = set(await db.tasks.distinct("id", {"id": {"$in": ids}}))
+        if still_live:
+            await db.tasks_archive.delete_many({"id": {"$in": list(still_live)}})
+        
+        moved_by_user = {}
+        for task, deleted_task in zip(tasks, deleted):
+            if deleted_task:
+                moved_by_user.setdefault(task["user_id"], []).append(task)
+        for user_id, moved in moved_by_user.items():
+            if TASK_COUNTERS_ENABLED:
+                increments = Counter()
+                for task in moved:
+                    increments.update(counter_increments(task, -1))
+                await db.task_counters.update_one({"user_id": user_id}, {"$inc": dict(increments)})
+            # Archived tasks leave the live set, so synced clients drop them too
+            await write_tombstones(user_id, [task["id"] for task in moved])
+            version = await bump_task_version(user_id, len(moved))
+            for offset, task in enumerate(moved):
+                await publish_task_event(user_id, "archived", task["id"], event_id=version - len(moved) + offset + 1)
+            archived += len(moved)
+    
+    task_archive_stats["archived"] += archived
+    task_archive_stats["last_run"] = datetime.now(timezone.utc)
+    if archived:
+        logger.info("Archived %d completed tasks", archived)
+    return archived
+
+async def run_task_archiver():
+    while True:
+        try:
+            await archive_completed_tasks()
+        except Exception:
+            logger.exception("Task archival failed")
+        await asyncio.sleep(ARCHIVE_INTERVAL)
+
+background_tasks = set()
+
+def start_background_task(coro, name: str):
+    async def runner():
+        try:
+            await coro
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Background task %s failed", name)
+    task = asyncio.create_task(runner(), name=name)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+@app.on_event("startup")
+async def startup_create_indexes():
+    global http_client
+    http_client = create_http_client()
+    await message_bus.connect()
+    if message_bus.redis:
+        start_background_task(message_bus.listen(), "message_bus")
+    try:
+        await ensure_indexes()
+        await log_query_plans()
+    except Exception:
+        logger.exception("Failed to create indexes")
+    start_background_task(migrate_task_documents(), "migrate_task_documents")
+    if TASK_CHANGE_STREAM_ENABLED:
+        start_background_task(watch_task_changes(), "watch_task_changes")
+    if SESSION_REAPER_INTERVAL > 0:
+        start_background_task(run_session_reaper(), "run_session_reaper")
+    if ARCHIVE_AFTER_DAYS > 0 and ARCHIVE_INTERVAL > 0:
+        start_background_task(run_task_archiver(), "run_task_archiver")
+    if TASK_COUNTERS_ENABLED and TASK_COUNTER_RESYNC_INTERVAL > 0:
+        start_background_task(run_task_counter_resync(), "run_task_counter_resync")
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    for task in list(background_tasks):
+        task.cancel()
+    if http_client:
+        await http_client.aclose()
+    await message_bus.close()
     client.close()
\ No newline at end of file
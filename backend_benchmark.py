@@ -0,0 +1,637 @@
+"""Load test and benchmark suite for the task API.
+
+Starts ``server:app`` under uvicorn in a subprocess with a stub auth provider,
+seeds users and tasks through the API, drives a concurrent mixed CRUD workload
+and reports req/s and p50/p95/p99 latency per endpoint as JSON.
+
+    python backend_benchmark.py --users 10 --tasks 500 --concurrency 32 --duration 20
+    python backend_benchmark.py --mongomock --output bench.json
+    python backend_benchmark.py --workers 4 --only list_tasks
+    python backend_benchmark.py --payloads --page-size 1000
+    python backend_benchmark.py --serialization
+    python backend_benchmark.py --users 1 --tasks 100000 --only search_tasks
+
+``--payloads`` skips the server and measures the size and encode time of one
+task list page in each wire format and content encoding. ``--serialization``
+likewise needs no database: it times turning 1k and 10k fetched tasks into a
+``GET /api/tasks`` body the old way (ISO strings, ``response_model``
+validation, ``jsonable_encoder``) and the current way (``task_list_response``).
+
+``--compare NAME`` imports the server in-process against MONGO_URL and times
+the previous and current implementation of one hot path, reporting p50/p99
+for each. ``--compare auth`` resolves ``--users`` seeded sessions with the old
+two ``find_one`` calls, the ``$lookup`` aggregation and the cached path:
+
+    python backend_benchmark.py --compare auth --users 100 --iterations 5000
+
+``--compare update`` edits ``--tasks`` seeded tasks with the old ``find_one``
++ ``update_one`` + ``find_one`` sequence, the single ``find_one_and_update``
+round trip, and the full ``update_task`` handler (which also maintains
+counters, the change version and the event stream):
+
+    python backend_benchmark.py --compare update --tasks 1000 --iterations 5000
+
+``--only search_tasks`` uses the server's SEARCH_BACKEND; set
+SEARCH_BACKEND=memory to measure the in-process index instead of the text
+index (mongomock only supports the memory backend).
+
+Run with increasing ``--workers`` to see how throughput scales across cores;
+multiple workers need a real mongod.
+
+Without ``--mongomock`` the server uses MONGO_URL (default
+mongodb://localhost:27017) and a throwaway database that is dropped afterwards.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).parent / "backend"
+
+# Relative weights of each operation in the mixed workload
+WORKLOAD = {
+    "list_tasks": 40,
+    "get_task": 20,
+    "create_task": 15,
+    "update_task": 15,
+    "delete_task": 5,
+    "task_stats": 5,
+    # Not part of the default mix; run with --only search_tasks
+    "search_tasks": 0,
+}
+
+# Words used for seeded titles and search queries
+SEARCH_WORDS = [
+    "report", "review", "invoice", "meeting", "deploy", "release", "budget", "contract",
+    "design", "planning", "customer", "support", "hiring", "training", "security", "migration",
+]
+
+
+class StubAuthHandler(BaseHTTPRequestHandler):
+    """Answers session-data lookups the way the real auth provider does."""
+
+    def do_GET(self):
+        session_id = self.headers.get("X-Session-ID", "anonymous")
+        body = json.dumps({
+            "id": f"bench-user-{session_id}",
+            "email": f"bench.{session_id}@example.com",
+            "name": f"Bench User {session_id}",
+            "picture": None,
+            "session_token": f"bench-token-{session_id}",
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def serve(port: int, use_mongomock: bool, workers: int):
+    """Run the API in this process (used as the benchmark's server subprocess)."""
+    sys.path.insert(0, str(BACKEND_DIR))
+    import uvicorn
+
+    if workers > 1:
+        uvicorn.run("server:app", host="127.0.0.1", port=port, workers=workers, log_level="warning")
+        return
+
+    import server
+
+    if use_mongomock:
+        from mongomock_motor import AsyncMongoMockClient
+        server.client = AsyncMongoMockClient(tz_aware=True)
+        server.db = server.client[os.environ["DB_NAME"]]
+    uvicorn.run(server.app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def process_cpu_seconds(pid: int):
+    """User + system CPU time of a process and its workers, or None without /proc."""
+    try:
+        fields = Path(f"/proc/{pid}/stat").read_text().rsplit(")", 1)[1].split()
+        children = Path(f"/proc/{pid}/task/{pid}/children").read_text().split()
+    except OSError:
+        return None
+    total = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    for child in children:
+        total += process_cpu_seconds(int(child)) or 0
+    return total
+
+
+PAYLOAD_FORMATS = {
+    "json": "application/json",
+    "columnar": "application/vnd.tasks.columnar+json",
+    "msgpack": "application/msgpack",
+}
+
+
+def generate_tasks(count: int, seed: int) -> list:
+    """Task documents as stored, with native datetimes."""
+    from datetime import datetime, timedelta, timezone
+
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    return [
+        {
+            "id": f"{rng.getrandbits(128):032x}",
+            "user_id": "bench-user",
+            "title": f"Task {i}",
+            "description": rng.choice([None, "Follow up with the team about the quarterly report"]),
+            "due_date": rng.choice([None, now + timedelta(days=rng.randint(-10, 30))]),
+            "status": rng.choice(["pending", "completed"]),
+            "priority": rng.choice(["low", "medium", "high"]),
+            "version": rng.randint(1, 5),
+            "created_at": now - timedelta(minutes=i),
+            "updated_at": now,
+        }
+        for i in range(count)
+    ]
+
+
+def payload_benchmark(page_size: int, seed: int, repeats: int = 20) -> dict:
+    """Size and median encode time of a task list page per format and encoding."""
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ.setdefault("DB_NAME", "bench_payloads")
+    sys.path.insert(0, str(BACKEND_DIR))
+    from fastapi import Response
+    import server
+
+    tasks = generate_tasks(page_size, seed)
+    encoders = {"identity": None, "gzip": server.GzipEncoder}
+    if server.brotli:
+        encoders["br"] = server.BrotliEncoder
+
+    results = {}
+    for name, media_type in PAYLOAD_FORMATS.items():
+        if name == "msgpack" and server.msgpack is None:
+            continue
+        for encoding, encoder in encoders.items():
+            timings = []
+            for _ in range(repeats):
+                started = time.perf_counter()
+                body = server.task_list_response([dict(task) for task in tasks], Response(), media_type).body
+                if encoder:
+                    body = encoder().finish(body)
+                timings.append(time.perf_counter() - started)
+            results[f"{name}+{encoding}"] = {
+                "bytes": len(body),
+                "encode_ms": round(sorted(timings)[len(timings) // 2] * 1000, 3),
+            }
+    return {"config": {"page_size": page_size, "repeats": repeats}, "payloads": results}
+
+
+SERIALIZATION_SIZES = [1000, 10000]
+
+
+def serialization_benchmark(seed: int, repeats: int = 20) -> dict:
+    """Time to turn fetched documents into a GET /api/tasks body, before and after.
+
+    The old path parses ISO date strings and lets FastAPI validate every task
+    against ``response_model=List[Task]`` and run ``jsonable_encoder``; the new
+    one dumps stored datetimes straight through ``task_list_response``.
+    """
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ.setdefault("DB_NAME", "bench_serialization")
+    sys.path.insert(0, str(BACKEND_DIR))
+    from datetime import datetime
+    from typing import List
+    from fastapi import Response
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from pydantic import TypeAdapter
+    import server
+
+    response_model = TypeAdapter(List[server.Task])
+
+    def old(stored):
+        tasks = [dict(task) for task in stored]
+        for task in tasks:
+            for field in ("created_at", "updated_at", "due_date"):
+                if isinstance(task.get(field), str):
+                    task[field] = datetime.fromisoformat(task[field])
+        return JSONResponse(jsonable_encoder(response_model.validate_python(tasks))).body
+
+    def new(stored):
+        return server.task_list_response([dict(task) for task in stored], Response()).body
+
+    results = {}
+    for size in SERIALIZATION_SIZES:
+        tasks = generate_tasks(size, seed)
+        string_dated = [
+            {key: value.isoformat() if isinstance(value, datetime) else value for key, value in task.items()}
+            for task in tasks
+        ]
+        variants = {"validated": (old, string_dated), "direct": (new, tasks)}
+        results[size] = {}
+        for name, (serialize, stored) in variants.items():
+            timings = []
+            for _ in range(repeats):
+                started = time.perf_counter()
+                body = serialize(stored)
+                timings.append(time.perf_counter() - started)
+            results[size][name] = {"bytes": len(body), **latency_summary(timings)}
+    return {"config": {"sizes": SERIALIZATION_SIZES, "repeats": repeats}, "serialization": results}
+
+
+def load_server(db_name: str, use_mongomock: bool):
+    """Import the server in this process against a throwaway database."""
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ["DB_NAME"] = db_name
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    sys.path.insert(0, str(BACKEND_DIR))
+    import server
+
+    if use_mongomock:
+        from mongomock_motor import AsyncMongoMockClient
+        server.client = AsyncMongoMockClient(tz_aware=True)
+        server.db = server.client[db_name]
+    return server
+
+
+def latency_summary(samples) -> dict:
+    samples = sorted(samples)
+    return {
+        "p50_ms": round(percentile(samples, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(samples, 0.99) * 1000, 3),
+        "mean_ms": round(sum(samples) / len(samples) * 1000, 3),
+    }
+
+
+async def time_variants(variants: dict, iterations: int) -> dict:
+    """Latency of each variant, interleaving them so drift hits all alike."""
+    samples = {name: [] for name in variants}
+    for i in range(iterations):
+        for name, call in variants.items():
+            started = time.perf_counter()
+            await call(i)
+            samples[name].append(time.perf_counter() - started)
+    return {name: latency_summary(values) for name, values in samples.items()}
+
+
+async def legacy_get_current_user(server, token: str):
+    """Authentication as it was before the $lookup: two finds per request."""
+    from datetime import datetime, timezone
+
+    session = await server.db.user_sessions.find_one({"session_token": token})
+    expires_at = session["expires_at"]
+    if isinstance(expires_at, str):
+        expires_at = datetime.fromisoformat(expires_at)
+    if expires_at < datetime.now(timezone.utc):
+        raise RuntimeError("Session expired")
+    user_doc = await server.db.users.find_one({"id": session["user_id"]}, {"_id": 0})
+    return server.User(**user_doc)
+
+
+async def compare_auth(server, args) -> dict:
+    from datetime import datetime, timedelta, timezone
+
+    now = datetime.now(timezone.utc)
+    await server.db.users.insert_many([
+        {"id": f"bench-user-{i}", "email": f"bench.{i}@example.com", "name": f"Bench User {i}", "created_at": now}
+        for i in range(args.users)
+    ])
+    await server.db.user_sessions.insert_many([
+        {"user_id": f"bench-user-{i}", "session_token": f"bench-token-{i}", "expires_at": now + timedelta(days=7), "created_at": now}
+        for i in range(args.users)
+    ])
+    await server.ensure_indexes()
+    tokens = [f"bench-token-{i}" for i in range(args.users)]
+    uncached = server.SessionCache(0, 0)
+    cached = server.SessionCache(server.SESSION_CACHE_SIZE, server.SESSION_CACHE_TTL)
+
+    async def old(i):
+        await legacy_get_current_user(server, tokens[i % len(tokens)])
+
+    async def new(i):
+        server.session_cache = uncached
+        await server.get_current_user(None, f"Bearer {tokens[i % len(tokens)]}")
+
+    async def new_cached(i):
+        server.session_cache = cached
+        await server.get_current_user(None, f"Bearer {tokens[i % len(tokens)]}")
+
+    return await time_variants({"two_finds": old, "lookup": new, "lookup_cached": new_cached}, args.iterations)
+
+
+async def legacy_update_task(server, user_id: str, task_id: str, update_data: dict):
+    """Task update as it was before find_one_and_update: three round trips."""
+    from datetime import datetime, timezone
+
+    existing_task = await server.db.tasks.find_one({"id": task_id, "user_id": user_id}, {"_id": 0})
+    if not existing_task:
+        raise RuntimeError("Task not found")
+    update_data = {**update_data, "updated_at": datetime.now(timezone.utc)}
+    await server.db.tasks.update_one({"id": task_id, "user_id": user_id}, {"$set": update_data})
+    updated_task = await server.db.tasks.find_one({"id": task_id}, {"_id": 0})
+    return server.Task(**updated_task)
+
+
+async def compare_update(server, args) -> dict:
+    from datetime import datetime, timedelta, timezone
+    from fastapi import Response
+    from pymongo import ReturnDocument
+
+    now = datetime.now(timezone.utc)
+    user = server.User(id="bench-user", email="bench@example.com", name="Bench User")
+    await server.db.users.insert_one(user.model_dump())
+    server.session_cache.set("bench-token", user, now + timedelta(days=1))
+    tasks = [server.Task(user_id=user.id, title=f"Task {i}") for i in range(args.tasks)]
+    await server.db.tasks.insert_many([server.task_document(task) for task in tasks])
+    await server.ensure_indexes()
+    await server.seed_task_counters(user.id)
+
+    async def old(i):
+        await legacy_update_task(server, user.id, tasks[i % len(tasks)].id, {"title": f"Old {i}"})
+
+    async def new(i):
+        task_id = tasks[i % len(tasks)].id
+        update_data = server.task_update_document(server.TaskUpdate(title=f"New {i}"))
+        previous_task = await server.db.tasks.find_one_and_update(
+            {"id": task_id, "user_id": user.id},
+            {"$set": update_data, "$inc": {"version": 1}},
+            projection={"_id": 0},
+            return_document=ReturnDocument.BEFORE
+        )
+        server.task_response({**previous_task, **update_data}, Response())
+
+    async def handler(i):
+        await server.update_task(
+            task_id=tasks[i % len(tasks)].id,
+            task_update=server.TaskUpdate(title=f"Handler {i}"),
+            response=Response(),
+            if_match=None,
+            session_token=None,
+            authorization="Bearer bench-token"
+        )
+
+    return await time_variants(
+        {"three_round_trips": old, "find_one_and_update": new, "update_task_handler": handler}, args.iterations
+    )
+
+
+COMPARISONS = {
+    "auth": compare_auth,
+    "update": compare_update,
+}
+
+
+def compare_benchmark(args) -> dict:
+    """Time the previous and current implementation of one hot path in-process."""
+    db_name = f"bench_compare_{int(time.time())}"
+    server = load_server(db_name, args.mongomock)
+
+    async def run():
+        try:
+            return await COMPARISONS[args.compare](server, args)
+        finally:
+            if not args.mongomock:
+                await server.client.drop_database(db_name)
+            server.client.close()
+
+    results = asyncio.run(run())
+    config = {"compare": args.compare, "iterations": args.iterations, "users": args.users, "tasks": args.tasks}
+    return {"config": config, "results": results}
+
+
+def percentile(sorted_values, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Benchmark:
+    def __init__(self, args, base_url: str, server_pid: int):
+        self.args = args
+        self.server_pid = server_pid
+        self.api_url = f"{base_url}/api"
+        self.random = random.Random(args.seed)
+        self.tokens = []
+        self.task_ids = {}
+        self.latencies = {name: [] for name in WORKLOAD}
+        self.errors = {name: 0 for name in WORKLOAD}
+
+    async def wait_until_ready(self, http: httpx.AsyncClient, timeout: float = 30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                await http.get(f"{self.api_url}/tasks/stats")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+        raise RuntimeError("Server did not start in time")
+
+    async def seed(self, http: httpx.AsyncClient):
+        for user_index in range(self.args.users):
+            response = await http.post(
+                f"{self.api_url}/auth/session",
+                headers={"X-Session-ID": f"{self.args.run_id}-{user_index}"}
+            )
+            response.raise_for_status()
+            token = response.json()["session_token"]
+            self.tokens.append(token)
+            self.task_ids[token] = []
+            for start in range(0, self.args.tasks, 1000):
+                operations = [
+                    {"op": "create", "data": {
+                        "title": f"{self.random.choice(SEARCH_WORDS)} {self.random.choice(SEARCH_WORDS)} {i}",
+                        "description": "Seeded by backend_benchmark.py",
+                        "priority": self.random.choice(["low", "medium", "high"]),
+                    }}
+                    for i in range(start, min(start + 1000, self.args.tasks))
+                ]
+                response = await http.post(
+                    f"{self.api_url}/tasks/bulk",
+                    json={"operations": operations, "ordered": False},
+                    headers={"Authorization": f"Bearer {token}"}
+                )
+                response.raise_for_status()
+                self.task_ids[token] += [result["id"] for result in response.json()["results"]]
+
+    async def run_operation(self, http: httpx.AsyncClient, name: str, token: str):
+        headers = {"Authorization": f"Bearer {token}"}
+        task_ids = self.task_ids[token]
+        if name in ("get_task", "update_task", "delete_task") and not task_ids:
+            name = "create_task"
+
+        started = time.perf_counter()
+        if name == "list_tasks":
+            response = await http.get(f"{self.api_url}/tasks", params={"limit": self.args.page_size}, headers=headers)
+        elif name == "get_task":
+            response = await http.get(f"{self.api_url}/tasks/{self.random.choice(task_ids)}", headers=headers)
+        elif name == "create_task":
+            response = await http.post(f"{self.api_url}/tasks", json={"title": "Benchmark task"}, headers=headers)
+        elif name == "update_task":
+            response = await http.put(
+                f"{self.api_url}/tasks/{self.random.choice(task_ids)}",
+                json={"status": self.random.choice(["pending", "completed"])},
+                headers=headers
+            )
+        elif name == "delete_task":
+            task_id = task_ids.pop(self.random.randrange(len(task_ids)))
+            response = await http.delete(f"{self.api_url}/tasks/{task_id}", headers=headers)
+        elif name == "search_tasks":
+            word = self.random.choice(SEARCH_WORDS)
+            query = word[:self.random.randint(3, len(word))]
+            response = await http.get(f"{self.api_url}/tasks/search", params={"q": query}, headers=headers)
+        else:
+            response = await http.get(f"{self.api_url}/tasks/stats", headers=headers)
+        elapsed = time.perf_counter() - started
+
+        self.latencies[name].append(elapsed)
+        if response.status_code >= 400:
+            self.errors[name] += 1
+        elif name == "create_task":
+            task_ids.append(response.json()["id"])
+
+    async def worker(self, http: httpx.AsyncClient, deadline: float):
+        workload = {self.args.only: 1} if self.args.only else WORKLOAD
+        names = list(workload)
+        weights = list(workload.values())
+        while time.monotonic() < deadline:
+            name = self.random.choices(names, weights)[0]
+            await self.run_operation(http, name, self.random.choice(self.tokens))
+
+    async def run(self) -> dict:
+        limits = httpx.Limits(max_connections=self.args.concurrency)
+        async with httpx.AsyncClient(timeout=30, limits=limits) as http:
+            await self.wait_until_ready(http)
+            await self.seed(http)
+            cpu_before = process_cpu_seconds(self.server_pid)
+            started = time.monotonic()
+            deadline = started + self.args.duration
+            await asyncio.gather(*(self.worker(http, deadline) for _ in range(self.args.concurrency)))
+            elapsed = time.monotonic() - started
+            cpu_after = process_cpu_seconds(self.server_pid)
+        server_cpu = cpu_after - cpu_before if cpu_before is not None and cpu_after is not None else None
+        return self.report(elapsed, server_cpu)
+
+    def report(self, elapsed: float, server_cpu) -> dict:
+        endpoints = {}
+        for name, samples in self.latencies.items():
+            samples = sorted(samples)
+            endpoints[name] = {
+                "requests": len(samples),
+                "errors": self.errors[name],
+                "rps": round(len(samples) / elapsed, 2),
+                "p50_ms": round(percentile(samples, 0.50) * 1000, 2),
+                "p95_ms": round(percentile(samples, 0.95) * 1000, 2),
+                "p99_ms": round(percentile(samples, 0.99) * 1000, 2),
+            }
+        all_samples = sorted(sample for samples in self.latencies.values() for sample in samples)
+        cpu_per_request = None
+        if server_cpu is not None and all_samples:
+            cpu_per_request = round(server_cpu / len(all_samples) * 1000, 3)
+        return {
+            "config": {
+                "users": self.args.users,
+                "tasks_per_user": self.args.tasks,
+                "concurrency": self.args.concurrency,
+                "duration_s": self.args.duration,
+                "page_size": self.args.page_size,
+                "backend": "mongomock" if self.args.mongomock else "mongod",
+                "only": self.args.only,
+                "workers": self.args.workers,
+            },
+            "total": {
+                "requests": len(all_samples),
+                "errors": sum(self.errors.values()),
+                "rps": round(len(all_samples) / elapsed, 2),
+                "p50_ms": round(percentile(all_samples, 0.50) * 1000, 2),
+                "p95_ms": round(percentile(all_samples, 0.95) * 1000, 2),
+                "p99_ms": round(percentile(all_samples, 0.99) * 1000, 2),
+                "server_cpu_ms_per_request": cpu_per_request,
+            },
+            "endpoints": endpoints,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--tasks", type=int, default=200, help="tasks seeded per user")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10, help="seconds of mixed workload")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--only", choices=list(WORKLOAD), help="run a single operation instead of the mix")
+    parser.add_argument("--mongomock", action="store_true", help="use an in-memory mongomock stand-in")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--payloads", action="store_true", help="benchmark list payload formats instead of the API")
+    parser.add_argument("--serialization", action="store_true", help="benchmark GET /api/tasks serialization before and after")
+    parser.add_argument("--compare", choices=list(COMPARISONS), help="time the old and new implementation of a hot path in-process")
+    parser.add_argument("--iterations", type=int, default=2000, help="calls per variant with --compare")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.mongomock, args.workers)
+        return
+    if args.mongomock and args.workers > 1:
+        parser.error("--workers needs a real mongod; mongomock state is per process")
+
+    if args.payloads:
+        report = payload_benchmark(args.page_size, args.seed)
+    elif args.serialization:
+        report = serialization_benchmark(args.seed)
+    elif args.compare:
+        report = compare_benchmark(args)
+    else:
+        report = run_api_benchmark(args)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        Path(args.output).write_text(output)
+
+
+def run_api_benchmark(args) -> dict:
+    args.run_id = f"{int(time.time())}"
+    stub = ThreadingHTTPServer(("127.0.0.1", 0), StubAuthHandler)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+
+    port = free_port()
+    env = {
+        **os.environ,
+        "MONGO_URL": os.environ.get("MONGO_URL", "mongodb://localhost:27017"),
+        "DB_NAME": f"bench_{args.run_id}",
+        "AUTH_PROVIDER_URL": f"http://127.0.0.1:{stub.server_address[1]}/",
+        "SESSION_REAPER_INTERVAL": "0",
+        "RATE_LIMIT_ENABLED": os.environ.get("RATE_LIMIT_ENABLED", "false"),
+    }
+    command = [sys.executable, __file__, "--serve", str(port), "--workers", str(args.workers)]
+    if args.mongomock:
+        command.append("--mongomock")
+    server_process = subprocess.Popen(command, env=env)
+    try:
+        return asyncio.run(Benchmark(args, f"http://127.0.0.1:{port}", server_process.pid).run())
+    finally:
+        server_process.terminate()
+        server_process.wait()
+        stub.shutdown()
+        if not args.mongomock:
+            from pymongo import MongoClient
+            MongoClient(env["MONGO_URL"]).drop_database(env["DB_NAME"])
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import axios from 'axios';
 import { Button } from './ui/button';
 import { Avatar, AvatarFallback, AvatarImage } from './ui/avatar';
@@ -19,7 +19,9 @@ const API = `${BACKEND_URL}/api`;
 
 const Dashboard = ({ user, logout }) => {
   const [tasks, setTasks] = useState([]);
+  const syncState = useRef({ token: null, tasks: new Map() });
   const [filteredTasks, setFilteredTasks] = useState([]);
+  const [stats, setStats] = useState({ total: 0, completed: 0, pending: 0 });
   const [loading, setLoading] = useState(true);
   const [filter, setFilter] = useState({ status: 'all', priority: 'all' });
   const [isDialogOpen, setIsDialogOpen] = useState(false);
@@ -39,12 +41,43 @@ const Dashboard = ({ user, logout }) => {
     applyFilters();
   }, [tasks, filter]);
 
+  const loadStats = async () => {
+    try {
+      const response = await axios.get(`${API}/tasks/stats`, { withCredentials: true });
+      setStats({
+        total: response.data.total,
+        completed: response.data.by_status.completed || 0,
+        pending: response.data.by_status.pending || 0
+      });
+    } catch (error) {
+      console.error('Error loading stats:', error);
+    }
+  };
+
   const loadTasks = async () => {
+    loadStats();
+    const state = syncState.current;
     try {
-      const response = await axios.get(`${API}/tasks`, { withCredentials: true });
-      setTasks(response.data);
+      // Only fetch what changed since the last sync
+      let hasMore = true;
+      while (hasMore) {
+        const response = await axios.get(`${API}/tasks/sync`, {
+          params: { limit: 1000, ...(state.token && { since: state.token }) },
+          withCredentials: true
+        });
+        response.data.tasks.forEach((task) => state.tasks.set(task.id, task));
+        response.data.deleted.forEach((taskId) => state.tasks.delete(taskId));
+        state.token = response.data.token;
+        hasMore = response.data.has_more;
+      }
+      setTasks([...state.tasks.values()].sort((a, b) => a.created_at.localeCompare(b.created_at)));
       setLoading(false);
     } catch (error) {
+      if (error.response?.status === 410 && state.token) {
+        // The token outlived the deletion history; start over with a full sync
+        syncState.current = { token: null, tasks: new Map() };
+        return loadTasks();
+      }
       console.error('Error loading tasks:', error);
       toast.error('Error al cargar tareas');
       setLoading(false);
@@ -173,12 +206,6 @@ const Dashboard = ({ user, logout }) => {
     }
   };
 
-  const stats = {
-    total: tasks.length,
-    completed: tasks.filter(t => t.status === 'completed').length,
-    pending: tasks.filter(t => t.status === 'pending').length
-  };
-
   return (
     <div className="min-h-screen bg-gradient-to-br from-blue-50 via-purple-50 to-pink-50">
       {/* Header */}
@@ -0,0 +1,52 @@
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "test_db")
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+import server  # noqa: E402
+
+USER_ID = "test-user"
+SESSION_TOKEN = "test-token"
+
+
+def run(coro):
+    return asyncio.new_event_loop().run_until_complete(coro)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """An empty in-memory database and fresh per-process caches."""
+    client = AsyncMongoMockClient(tz_aware=True)
+    monkeypatch.setattr(server, "client", client)
+    monkeypatch.setattr(server, "db", client["test_db"])
+    monkeypatch.setattr(server, "session_cache", server.SessionCache(server.SESSION_CACHE_SIZE, server.SESSION_CACHE_TTL))
+    monkeypatch.setattr(server, "rate_limiter", server.TokenBucketLimiter(
+        server.RATE_LIMIT_PER_SECOND, server.RATE_LIMIT_BURST, server.RATE_LIMIT_MAX_KEYS
+    ))
+    server.search_indexes.clear()
+    return server.db
+
+
+@pytest.fixture
+def api(db):
+    """A test client authenticated as USER_ID."""
+    now = datetime.now(timezone.utc)
+    run(db.users.insert_one({"id": USER_ID, "email": "test@example.com", "name": "Test User", "created_at": now}))
+    run(db.user_sessions.insert_one({
+        "user_id": USER_ID,
+        "session_token": SESSION_TOKEN,
+        "expires_at": now + timedelta(days=7),
+        "created_at": now,
+    }))
+    client = TestClient(server.app)
+    client.headers["Authorization"] = f"Bearer {SESSION_TOKEN}"
+    return client
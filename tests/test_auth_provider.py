@@ -0,0 +1,97 @@
+import asyncio
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+import httpx
+
+import server
+from backend_benchmark import StubAuthHandler
+from tests.conftest import SESSION_TOKEN, run
+
+LOGIN_DELAY = 1.0
+
+
+class SlowStubAuthHandler(StubAuthHandler):
+    """The benchmark's stub auth provider, answering after LOGIN_DELAY seconds."""
+
+    def do_GET(self):
+        time.sleep(LOGIN_DELAY)
+        super().do_GET()
+
+
+def start_stub(handler):
+    stub = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    return stub
+
+
+def test_task_requests_are_not_delayed_by_logins_in_flight(api, monkeypatch):
+    stub = start_stub(SlowStubAuthHandler)
+    monkeypatch.setattr(server, "AUTH_PROVIDER_URL", f"http://127.0.0.1:{stub.server_address[1]}/")
+    monkeypatch.setattr(server, "http_client", None)
+
+    async def scenario():
+        server.http_client = server.create_http_client()
+        transport = httpx.ASGITransport(app=server.app)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+                logins = [
+                    asyncio.create_task(client.post("/api/auth/session", headers={"X-Session-ID": f"login-{i}"}))
+                    for i in range(5)
+                ]
+                await asyncio.sleep(0.1)
+
+                latencies = []
+                while not all(login.done() for login in logins):
+                    started = time.monotonic()
+                    response = await client.get("/api/tasks", headers={"Authorization": f"Bearer {SESSION_TOKEN}"})
+                    assert response.status_code == 200
+                    latencies.append(time.monotonic() - started)
+                    await asyncio.sleep(0.05)
+                return [login.result() for login in logins], latencies
+        finally:
+            await server.http_client.aclose()
+
+    try:
+        logins, latencies = run(scenario())
+    finally:
+        stub.shutdown()
+
+    assert [login.status_code for login in logins] == [200] * 5
+    # Task requests kept being served during the whole login window
+    assert len(latencies) >= 10
+    assert max(latencies) < LOGIN_DELAY / 4
+
+
+def test_provider_5xx_is_retried(db, monkeypatch):
+    attempts = []
+
+    class FlakyStubAuthHandler(StubAuthHandler):
+        def do_GET(self):
+            attempts.append(self.path)
+            if len(attempts) == 1:
+                self.send_response(503)
+                self.end_headers()
+                return
+            super().do_GET()
+
+    stub = start_stub(FlakyStubAuthHandler)
+    monkeypatch.setattr(server, "AUTH_PROVIDER_URL", f"http://127.0.0.1:{stub.server_address[1]}/")
+    monkeypatch.setattr(server, "http_client", None)
+    monkeypatch.setattr(server, "AUTH_PROVIDER_BACKOFF", 0.01)
+
+    async def login():
+        server.http_client = server.create_http_client()
+        try:
+            return await server.fetch_session_data("retry-me")
+        finally:
+            await server.http_client.aclose()
+
+    try:
+        session_data = run(login())
+    finally:
+        stub.shutdown()
+
+    assert session_data["session_token"] == "bench-token-retry-me"
+    assert len(attempts) == 2
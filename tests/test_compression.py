@@ -0,0 +1,106 @@
+import gzip
+import zlib
+
+import pytest
+
+import server
+from tests.conftest import run
+
+
+def create_tasks(api, count):
+    for i in range(count):
+        api.post("/api/tasks", json={"title": f"Task {i}", "description": "Long enough to be worth compressing"})
+
+
+def test_small_responses_are_not_compressed(api):
+    response = api.get("/api/tasks", headers={"Accept-Encoding": "gzip"})
+    assert len(response.content) < server.COMPRESSION_MIN_SIZE
+    assert "content-encoding" not in response.headers
+
+
+@pytest.mark.parametrize("encoding", [
+    "gzip", pytest.param("br", marks=pytest.mark.skipif(server.brotli is None, reason="brotli is not installed")),
+])
+def test_compressed_list_round_trips(api, encoding):
+    create_tasks(api, 20)
+    identity = api.get("/api/tasks", headers={"Accept-Encoding": "identity"})
+    with api.stream("GET", "/api/tasks", headers={"Accept-Encoding": encoding}) as response:
+        raw = b"".join(response.iter_raw())
+    decompress = gzip.decompress if encoding == "gzip" else server.brotli.decompress
+    assert response.headers["content-encoding"] == encoding
+    assert int(response.headers["content-length"]) == len(raw) < len(identity.content)
+    assert decompress(raw) == identity.content
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert "Accept" in [value.strip() for value in response.headers["vary"].split(",")]
+
+
+def test_compressed_etag_is_weak_and_still_matches(api):
+    create_tasks(api, 20)
+    response = api.get("/api/tasks", headers={"Accept-Encoding": "gzip"})
+    etag = response.headers["etag"]
+    assert etag.startswith('W/"')
+    assert api.get("/api/tasks", headers={"Accept-Encoding": "identity"}).headers["etag"] == etag[2:]
+
+    cached = api.get("/api/tasks", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+
+def test_streamed_body_is_flushed_per_chunk():
+    chunks = [b'{"id": "%d", "title": "Streamed task"}\n' % i for i in range(3)]
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/x-ndjson")]})
+        for chunk in chunks:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "headers": [(b"accept-encoding", b"gzip")]}
+    run(server.CompressionMiddleware(app)(scope, None, send))
+
+    start, *bodies = messages
+    headers = dict(start["headers"])
+    assert headers[b"content-encoding"] == b"gzip"
+    assert b"content-length" not in headers
+    # Every chunk decodes on arrival, before the stream ends
+    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    for chunk, body in zip(chunks, bodies):
+        assert decoder.decompress(body["body"]) == chunk
+    assert bodies[-1]["more_body"] is False
+
+
+@pytest.mark.parametrize("accept, expected", [
+    (None, "json"),
+    ("application/msgpack", "msgpack" if server.msgpack else "json"),
+    ("application/x-msgpack", "msgpack" if server.msgpack else "json"),
+    ("application/vnd.tasks.columnar+json", "columnar"),
+    ("application/json;q=0.5, application/msgpack;q=0.9", "msgpack" if server.msgpack else "json"),
+    ("application/msgpack;q=0.1, application/json", "json"),
+    ("application/msgpack;q=0", "json"),
+    ("text/html", "json"),
+])
+def test_negotiate_list_format(accept, expected):
+    assert server.negotiate_list_format(accept) == expected
+
+
+@pytest.mark.skipif(server.msgpack is None, reason="msgpack is not installed")
+def test_msgpack_and_columnar_lists(api):
+    create_tasks(api, 3)
+    expected = api.get("/api/tasks").json()
+
+    packed = api.get("/api/tasks", headers={"Accept": "application/msgpack"})
+    assert packed.headers["content-type"] == "application/msgpack"
+    tasks = server.msgpack.unpackb(packed.content, timestamp=3)
+    assert [task["id"] for task in tasks] == [task["id"] for task in expected]
+    assert tasks[0]["created_at"].isoformat().startswith(expected[0]["created_at"][:19])
+
+    columnar = api.get("/api/tasks", headers={"Accept": "application/json;q=0.2, application/vnd.tasks.columnar+json"})
+    assert columnar.headers["content-type"] == "application/vnd.tasks.columnar+json"
+    columns = columnar.json()
+    assert columns["id"] == [task["id"] for task in expected]
+    assert columns["title"] == [task["title"] for task in expected]
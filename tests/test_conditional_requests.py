@@ -0,0 +1,29 @@
+def test_task_etag_round_trip(api):
+    task_id = api.post("/api/tasks", json={"title": "Cached"}).json()["id"]
+    etag = api.get(f"/api/tasks/{task_id}").headers["ETag"]
+
+    response = api.get(f"/api/tasks/{task_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+
+    api.put(f"/api/tasks/{task_id}", json={"title": "Changed"})
+    assert api.get(f"/api/tasks/{task_id}", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_missing_task_is_never_not_modified(api):
+    api.post("/api/tasks", json={"title": "Bumps the user version"})
+    for etag in ['"1.1"', '"1.whatever"', "*"]:
+        assert api.get("/api/tasks/missing", headers={"If-None-Match": etag}).status_code == 404
+
+
+def test_list_etag_does_not_validate_a_task(api):
+    task_id = api.post("/api/tasks", json={"title": "Listed"}).json()["id"]
+    list_etag = api.get("/api/tasks").headers["ETag"]
+    assert api.get(f"/api/tasks/{task_id}", headers={"If-None-Match": list_etag}).status_code == 200
+
+
+def test_stale_if_match_is_rejected(api):
+    task_id = api.post("/api/tasks", json={"title": "Contended"}).json()["id"]
+    etag = api.get(f"/api/tasks/{task_id}").headers["ETag"]
+    assert api.put(f"/api/tasks/{task_id}", json={"title": "First"}, headers={"If-Match": etag}).status_code == 200
+    assert api.put(f"/api/tasks/{task_id}", json={"title": "Second"}, headers={"If-Match": etag}).status_code == 412
@@ -0,0 +1,87 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+import server
+from tests.conftest import SESSION_TOKEN, run
+
+
+def make_bus(redis_server, received):
+    bus = server.MessageBus("redis://fake")
+    bus.redis = fakeredis.aioredis.FakeRedis(server=redis_server)
+    bus.subscribe("test", received.append)
+    return bus
+
+
+async def wait_for(condition, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("condition not met in time")
+        await asyncio.sleep(0.01)
+
+
+def test_messages_reach_other_workers_only():
+    async def scenario():
+        redis_server = fakeredis.FakeServer()
+        sent, received = [], []
+        sender = make_bus(redis_server, sent)
+        receiver = make_bus(redis_server, received)
+        listeners = [asyncio.create_task(bus.listen()) for bus in (sender, receiver)]
+        await asyncio.sleep(0.05)
+
+        await sender.publish("test", {"n": 1})
+        await wait_for(lambda: received)
+        await asyncio.sleep(0.05)
+        for listener in listeners:
+            listener.cancel()
+        await asyncio.gather(*listeners, return_exceptions=True)
+        return sent, received
+
+    sent, received = run(scenario())
+    assert received == [{"n": 1}]
+    assert sent == []
+
+
+def test_listener_reconnects_after_redis_outage(monkeypatch):
+    monkeypatch.setattr(server, "MESSAGE_BUS_RECONNECT_MIN", 0.01)
+
+    async def scenario():
+        redis_server = fakeredis.FakeServer()
+        received = []
+        sender = make_bus(redis_server, [])
+        receiver = make_bus(redis_server, received)
+        listener = asyncio.create_task(receiver.listen())
+        await asyncio.sleep(0.05)
+
+        redis_server.connected = False
+        await sender.publish("test", {"n": 1})
+        await asyncio.sleep(0.1)
+        redis_server.connected = True
+        # Publish until the reconnected listener has resubscribed
+        for _ in range(40):
+            await sender.publish("test", {"n": 2})
+            await asyncio.sleep(0.05)
+            if received:
+                break
+        assert not listener.done()
+        listener.cancel()
+        await asyncio.gather(listener, return_exceptions=True)
+        return received
+
+    assert run(scenario())[0] == {"n": 2}
+
+
+@pytest.mark.parametrize("request_kind", ["create", "logout"])
+def test_redis_outage_does_not_fail_requests(api, monkeypatch, request_kind):
+    redis_server = fakeredis.FakeServer()
+    redis_server.connected = False
+    monkeypatch.setattr(server.message_bus, "redis", fakeredis.aioredis.FakeRedis(server=redis_server))
+
+    if request_kind == "create":
+        response = api.post("/api/tasks", json={"title": "Written while Redis is down"})
+    else:
+        api.cookies.set("session_token", SESSION_TOKEN)
+        response = api.post("/api/auth/logout")
+    assert response.status_code == 200
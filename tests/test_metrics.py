@@ -0,0 +1,40 @@
+import threading
+
+import server
+
+
+def test_registry_is_safe_across_threads():
+    registry = server.MetricsRegistry()
+    done = threading.Event()
+
+    def record(worker):
+        for i in range(5000):
+            registry.inc("commands_total", {"command": f"find{i % 200}"})
+            registry.observe("command_duration_seconds", 0.001 * (i % 50), {"worker": worker})
+        done.set()
+
+    threads = [threading.Thread(target=record, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    while not done.is_set():
+        registry.render()
+    for thread in threads:
+        thread.join()
+
+    body = registry.render()
+    for worker in range(4):
+        assert f'command_duration_seconds_count{{worker="{worker}"}} 5000' in body
+    assert sum(value for (name, _), value in registry._counters.items() if name == "commands_total") == 20000
+
+
+def test_profile_accumulates_mongo_time_from_threads():
+    profile = server.RequestProfile(1)
+    threads = [
+        threading.Thread(target=lambda: [profile.add_mongo_time(0.001) for _ in range(1000)])
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert round(profile.mongo_seconds, 6) == 4.0
@@ -0,0 +1,42 @@
+import json
+from collections import Counter
+from datetime import datetime, timezone
+
+import server
+from tests.conftest import USER_ID, run
+
+
+def test_summary_buckets_match_real_frames():
+    profile = server.RequestProfile(1)
+    profile.wall_seconds = 0.4
+    route = "run (base_events.py:1);get_tasks (server.py:1)"
+    profile.stacks = Counter({
+        f"{route};task_list_response (server.py:1);dump_json (type_adapter.py:1)": 1,
+        f"{route};serialize_response (routing.py:1);jsonable_encoder (encoders.py:1)": 1,
+        f"{route};serialize_response (routing.py:1);validate (fields.py:1)": 1,
+        "run (base_events.py:1);select (selectors.py:1)": 1,
+    })
+    summary = profile.summary()
+    assert summary["json_encoding_ms"] == 200
+    assert summary["pydantic_validation_ms"] == 100
+    assert summary["idle_loop_ms"] == 100
+
+
+def test_profiled_task_list_reports_encoding_time(api, db, monkeypatch, tmp_path):
+    monkeypatch.setattr(server, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(server, "PROFILING_TOKEN", "profile-me")
+    monkeypatch.setattr(server, "PROFILING_DIR", tmp_path)
+    monkeypatch.setattr(server, "PROFILING_INTERVAL", 0.0005)
+    now = datetime.now(timezone.utc)
+    run(db.tasks.insert_many([
+        server.task_document(server.Task(
+            user_id=USER_ID, title=f"Task {i}", description="Profiled " * 40, created_at=now, updated_at=now
+        ))
+        for i in range(1000)
+    ]))
+
+    response = api.get("/api/tasks", params={"limit": 1000}, headers={"X-Profile": "profile-me"})
+    assert response.status_code == 200
+    summary = json.loads((tmp_path / response.headers["X-Profile-Id"]).with_suffix(".json").read_text())
+    assert summary["samples"] > 0
+    assert summary["json_encoding_ms"] > 0
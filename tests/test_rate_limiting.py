@@ -0,0 +1,110 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+import server
+from tests.conftest import SESSION_TOKEN, run
+
+
+def test_user_is_limited_after_burst(api, monkeypatch):
+    monkeypatch.setattr(server, "rate_limiter", server.TokenBucketLimiter(0.01, 3, 100))
+    statuses = [api.get("/api/tasks").status_code for _ in range(5)]
+    assert statuses == [200, 200, 200, 429, 429]
+
+
+def test_unknown_tokens_are_limited_by_ip(db, monkeypatch):
+    monkeypatch.setattr(server, "rate_limiter", server.TokenBucketLimiter(0.01, 3, 100))
+    client = TestClient(server.app)
+    responses = [client.get("/api/tasks", headers={"Authorization": f"Bearer bogus{i}"}) for i in range(5)]
+    assert [response.status_code for response in responses] == [401, 401, 401, 429, 429]
+    assert responses[-1].headers["Retry-After"]
+
+
+def test_shed_response_carries_cors_headers(api, monkeypatch):
+    monkeypatch.setattr(server.mongo_commands, "in_flight", server.MONGO_IN_FLIGHT_LIMIT)
+    response = api.get("/api/tasks", headers={"Origin": "https://app.example.com"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(server.SHED_RETRY_AFTER)
+    assert response.headers["Access-Control-Allow-Origin"]
+    assert "Retry-After" in response.headers["Access-Control-Expose-Headers"]
+
+
+def test_route_class_concurrency_limit(api, monkeypatch):
+    monkeypatch.setitem(server.CONCURRENCY_LIMITS, "read", 0)
+    assert api.get("/api/tasks").status_code == 503
+    assert api.post("/api/tasks", json={"title": "Still writable"}).status_code == 200
+
+
+def test_tokens_do_not_bypass_the_ip_limit_on_auth_routes(db, monkeypatch):
+    monkeypatch.setattr(server, "rate_limiter", server.TokenBucketLimiter(0.01, 3, 100))
+    client = TestClient(server.app)
+    statuses = [
+        client.post("/api/auth/session", headers={"Authorization": "Bearer junk"}).status_code,
+        client.post("/api/auth/logout", cookies={"session_token": "junk"}).status_code,
+        client.post("/api/auth/session", headers={"Authorization": "Bearer junk"}).status_code,
+        client.post("/api/auth/session", headers={"Authorization": "Bearer junk"}).status_code,
+        client.post("/api/auth/logout", cookies={"session_token": "junk"}).status_code,
+    ]
+    assert statuses == [400, 200, 400, 429, 429]
+
+
+def stream_scope(path):
+    return {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"authorization", f"Bearer {SESSION_TOKEN}".encode())],
+        "client": ("127.0.0.1", 1234), "server": ("testserver", 80),
+    }
+
+
+def test_stream_slot_is_held_until_the_body_is_sent(api, monkeypatch):
+    monkeypatch.setitem(server.CONCURRENCY_LIMITS, "stream", 1)
+    monkeypatch.setattr(server, "EXPORT_BATCH_SIZE", 1)
+    for i in range(3):
+        api.post("/api/tasks", json={"title": f"Task {i}"})
+    seen = []
+
+    def receiver():
+        messages = [{"type": "http.request", "body": b"", "more_body": False}]
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await asyncio.Event().wait()
+
+        return receive
+
+    async def export():
+        async def send(message):
+            if message["type"] == "http.response.body" and message.get("more_body") and not seen:
+                statuses = []
+
+                async def send_second(second):
+                    if second["type"] == "http.response.start":
+                        statuses.append(second["status"])
+
+                await server.app(stream_scope("/api/tasks/export"), receiver(), send_second)
+                seen.append((server.in_flight_by_class["stream"], statuses[0]))
+
+        await server.app(stream_scope("/api/tasks/export"), receiver(), send)
+
+    run(export())
+    # Mid-stream the slot is still taken, so a second stream is shed
+    assert seen == [(1, 503)]
+    assert server.in_flight_by_class["stream"] == 0
+
+
+def test_requests_are_shed_when_connections_queue_up(api, monkeypatch):
+    monkeypatch.setattr(server, "mongo_pool", server.MongoPoolMetrics())
+    # A full pool never reports more commands in flight than maxPoolSize
+    monkeypatch.setattr(server.mongo_commands, "in_flight", server.MONGO_IN_FLIGHT_LIMIT // 2)
+    for _ in range(server.MONGO_IN_FLIGHT_LIMIT // 2):
+        server.mongo_pool.connection_check_out_started(None)
+    assert api.get("/api/tasks").status_code == 503
+
+    server.mongo_pool.connection_checked_out(None)
+    assert api.get("/api/tasks").status_code == 200
+
+
+def test_shed_limit_defaults_above_the_pool_size():
+    assert server.MONGO_IN_FLIGHT_LIMIT > server.client.options.pool_options.max_pool_size
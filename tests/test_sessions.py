@@ -0,0 +1,51 @@
+import re
+from datetime import datetime, timedelta, timezone
+
+from fastapi.testclient import TestClient
+
+import server
+from tests.conftest import USER_ID, run
+
+
+def metric(client, name):
+    body = client.get("/metrics").text
+    return float(re.search(rf"^{name} (\S+)$", body, re.MULTILINE).group(1))
+
+
+def test_cache_stats_are_only_exported_as_metrics(api):
+    api.get("/api/tasks")
+    api.get("/api/tasks")
+    assert metric(api, "session_cache_hits") >= 1
+    assert metric(api, "session_cache_misses") >= 1
+    assert TestClient(server.app).get("/api/auth/cache-stats").status_code == 404
+
+
+def test_reaper_stats_are_only_exported_as_metrics(api, db, monkeypatch):
+    monkeypatch.setattr(server, "session_reaper_stats", {"runs": 0, "deleted": 0, "last_run": None, "last_duration_ms": None})
+    expired = datetime.now(timezone.utc) - timedelta(days=1)
+    run(db.user_sessions.insert_one({"user_id": USER_ID, "session_token": "expired", "expires_at": expired}))
+
+    assert run(server.reap_expired_sessions()) == 1
+    assert metric(api, "session_reaper_runs") == 1
+    assert metric(api, "session_reaper_deleted") == 1
+    assert TestClient(server.app).get("/api/auth/reaper-stats").status_code == 404
+
+
+def sessions_after_limit(db, monkeypatch, limit):
+    monkeypatch.setattr(server, "MAX_SESSIONS_PER_USER", limit)
+    now = datetime.now(timezone.utc)
+    run(db.user_sessions.insert_many([
+        {"user_id": USER_ID, "session_token": f"extra-{i}", "created_at": now + timedelta(minutes=i)}
+        for i in range(3)
+    ]))
+    run(server.enforce_session_limit(USER_ID))
+    return run(db.user_sessions.count_documents({"user_id": USER_ID}))
+
+
+def test_session_limit_keeps_newest_sessions(db, monkeypatch):
+    assert sessions_after_limit(db, monkeypatch, 2) == 2
+
+
+def test_zero_session_limit_means_no_cap(db, monkeypatch):
+    before = run(db.user_sessions.count_documents({"user_id": USER_ID}))
+    assert sessions_after_limit(db, monkeypatch, 0) == before + 3
@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta, timezone
+
+import server
+
+
+def create_due(api, title, due_date):
+    return api.post("/api/tasks", json={"title": title, "due_date": due_date.isoformat()}).json()["id"]
+
+
+def test_agenda_buckets(api):
+    now = datetime.now(timezone.utc)
+    create_due(api, "late", now - timedelta(days=2))
+    create_due(api, "soon", now + timedelta(days=2))
+    create_due(api, "far", now + timedelta(days=30))
+
+    agenda = api.get("/api/tasks/agenda", params={"days": 7}).json()
+    assert [task["title"] for task in agenda["overdue"]] == ["late"]
+    assert [task["title"] for task in agenda["upcoming"]] == ["soon"]
+
+
+def test_overdue_tasks_do_not_crowd_out_other_buckets(api, monkeypatch):
+    monkeypatch.setattr(server, "AGENDA_MAX_TASKS", 5)
+    now = datetime.now(timezone.utc)
+    for i in range(6):
+        create_due(api, f"late {i}", now - timedelta(days=10 + i))
+    create_due(api, "tomorrow", now + timedelta(days=1, hours=1))
+
+    response = api.get("/api/tasks/agenda")
+    agenda = response.json()
+    assert len(agenda["overdue"]) == 5
+    assert [task["title"] for task in agenda["upcoming"]] == ["tomorrow"]
+    assert response.headers["X-Agenda-Truncated"] == "overdue"
+
+
+def test_completed_tasks_are_left_out(api):
+    now = datetime.now(timezone.utc)
+    done = create_due(api, "done", now - timedelta(days=1))
+    api.put(f"/api/tasks/{done}", json={"status": "completed"})
+    create_due(api, "open", now - timedelta(days=1))
+
+    agenda = api.get("/api/tasks/agenda").json()
+    assert [task["title"] for task in agenda["overdue"]] == ["open"]
@@ -0,0 +1,115 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import server
+from tests.conftest import USER_ID, run
+
+
+def age_tasks(db, task_ids, days=365):
+    old = datetime.now(timezone.utc) - timedelta(days=days)
+    run(db.tasks.update_many({"id": {"$in": task_ids}}, {"$set": {"updated_at": old}}))
+
+
+def create_completed_tasks(api, count):
+    task_ids = []
+    for i in range(count):
+        task_id = api.post("/api/tasks", json={"title": f"Done {i}"}).json()["id"]
+        api.put(f"/api/tasks/{task_id}", json={"status": "completed"})
+        task_ids.append(task_id)
+    return task_ids
+
+
+class BatchReadBarrier:
+    """Proxy for db.tasks that holds the first batch read of two runs until both have read it."""
+
+    def __init__(self, tasks):
+        self._tasks = tasks
+        self._barrier = asyncio.Barrier(2)
+        self._waiting = 2
+
+    def __getattr__(self, name):
+        return getattr(self._tasks, name)
+
+    def find(self, *args, **kwargs):
+        proxy = self
+        cursor = self._tasks.find(*args, **kwargs)
+
+        class Cursor:
+            def sort(self, *sort_args):
+                nonlocal cursor
+                cursor = cursor.sort(*sort_args)
+                return self
+
+            async def to_list(self, length):
+                docs = await cursor.to_list(length)
+                if proxy._waiting:
+                    proxy._waiting -= 1
+                    await proxy._barrier.wait()
+                return docs
+
+        return Cursor()
+
+
+class BarrierDatabase:
+    def __init__(self, db):
+        self._db = db
+        self.tasks = BatchReadBarrier(db.tasks)
+
+    def __getattr__(self, name):
+        return getattr(self._db, name)
+
+    def __getitem__(self, name):
+        return self.tasks if name == "tasks" else self._db[name]
+
+
+def test_archives_old_completed_tasks(api, db):
+    task_ids = create_completed_tasks(api, 3)
+    age_tasks(db, task_ids[:2])
+
+    assert run(server.archive_completed_tasks()) == 2
+    assert [task["id"] for task in api.get("/api/tasks").json()] == [task_ids[2]]
+    assert {task["id"] for task in api.get("/api/tasks/archive").json()} == set(task_ids[:2])
+    assert api.get(f"/api/tasks/{task_ids[0]}").status_code == 404
+    assert api.get(f"/api/tasks/{task_ids[0]}", params={"include_archived": "true"}).status_code == 200
+    assert api.get("/api/tasks/stats").json()["total"] == 1
+
+
+def test_overlapping_runs_move_each_task_once(api, db, monkeypatch):
+    task_ids = create_completed_tasks(api, 5)
+    age_tasks(db, task_ids)
+    assert api.get("/api/tasks/stats").json()["total"] == 5
+    version_before = run(server.get_task_version(USER_ID))
+
+    monkeypatch.setattr(server, "db", BarrierDatabase(db))
+
+    async def overlapping_runs():
+        return await asyncio.gather(server.archive_completed_tasks(), server.archive_completed_tasks())
+
+    assert sum(run(overlapping_runs())) == 5
+    monkeypatch.setattr(server, "db", db)
+    assert api.get("/api/tasks/stats").json()["total"] == 0
+    assert run(server.get_task_version(USER_ID)) == version_before + 5
+    assert run(db.tasks_archive.count_documents({})) == 5
+
+
+def test_deletes_are_bounded_per_worker(api, db, monkeypatch):
+    task_ids = create_completed_tasks(api, 12)
+    age_tasks(db, task_ids)
+    monkeypatch.setattr(server, "ARCHIVE_DELETE_CONCURRENCY", 3)
+    collection_type = type(db.tasks)
+    find_one_and_delete = collection_type.find_one_and_delete
+    in_flight = []
+    peak = []
+
+    async def tracked_delete(self, *args, **kwargs):
+        in_flight.append(1)
+        peak.append(len(in_flight))
+        await asyncio.sleep(0.01)
+        try:
+            return await find_one_and_delete(self, *args, **kwargs)
+        finally:
+            in_flight.pop()
+
+    monkeypatch.setattr(collection_type, "find_one_and_delete", tracked_delete)
+    assert run(server.archive_completed_tasks()) == 12
+    assert max(peak) == 3
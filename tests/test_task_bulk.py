@@ -0,0 +1,122 @@
+import pytest
+
+import server
+from tests.conftest import USER_ID, run
+
+
+@pytest.fixture
+def events(monkeypatch):
+    published = []
+
+    async def record(user_id, event_type, task_id, task=None, event_id=None):
+        published.append((event_type, task_id, event_id))
+
+    monkeypatch.setattr(server, "publish_task_event", record)
+    return published
+
+
+def bulk(api, operations, ordered=True):
+    response = api.post("/api/tasks/bulk", json={"operations": operations, "ordered": ordered})
+    assert response.status_code == 200
+    return response.json()
+
+
+def statuses(body):
+    return [result["status"] for result in body["results"]]
+
+
+def test_mixed_batch_is_applied(api, events):
+    task_id = api.post("/api/tasks", json={"title": "Existing"}).json()["id"]
+    other_id = api.post("/api/tasks", json={"title": "Other"}).json()["id"]
+    version = run(server.get_task_version(USER_ID))
+    events.clear()
+
+    body = bulk(api, [
+        {"op": "create", "data": {"title": "New"}},
+        {"op": "update", "id": task_id, "data": {"status": "completed"}},
+        {"op": "delete", "id": other_id},
+    ])
+
+    assert statuses(body) == ["ok", "ok", "ok"]
+    assert (body["inserted"], body["modified"], body["deleted"]) == (1, 1, 1)
+    assert api.get(f"/api/tasks/{task_id}").json()["status"] == "completed"
+    assert api.get(f"/api/tasks/{other_id}").status_code == 404
+    assert [event[:2] for event in events] == [
+        ("created", body["results"][0]["id"]), ("updated", task_id), ("deleted", other_id)
+    ]
+    assert [event[2] for event in events] == [version + 1, version + 2, version + 3]
+
+
+def test_ordered_batch_skips_after_validation_error(api, events):
+    body = bulk(api, [
+        {"op": "create", "data": {"title": "First"}},
+        {"op": "create", "data": {}},
+        {"op": "create", "data": {"title": "Never written"}},
+    ])
+    assert statuses(body) == ["ok", "error", "skipped"]
+    assert body["inserted"] == 1
+    assert [task["title"] for task in api.get("/api/tasks").json()] == ["First"]
+    assert [event[0] for event in events] == ["created"]
+
+
+def test_ordered_batch_skips_after_ownership_failure(api, db, events):
+    run(db.tasks.insert_one({"id": "foreign", "user_id": "someone-else", "title": "Not mine"}))
+    body = bulk(api, [
+        {"op": "delete", "id": "foreign"},
+        {"op": "create", "data": {"title": "Never written"}},
+    ])
+    assert body["results"][0] == {"index": 0, "op": "delete", "id": "foreign", "status": "error", "error": "Task not found"}
+    assert statuses(body) == ["error", "skipped"]
+    assert run(db.tasks.count_documents({"id": "foreign"})) == 1
+    assert events == []
+
+
+def test_unordered_batch_applies_the_rest(api, events):
+    version = run(server.get_task_version(USER_ID))
+    body = bulk(api, [
+        {"op": "update", "id": "missing", "data": {"title": "Nope"}},
+        {"op": "create", "data": {"title": "Kept"}},
+        {"op": "create", "data": {"priority": "high"}},
+        {"op": "create", "data": {"title": "Also kept"}},
+    ], ordered=False)
+    assert statuses(body) == ["error", "ok", "error", "ok"]
+    assert body["inserted"] == 2
+    assert len(events) == 2
+    assert run(server.get_task_version(USER_ID)) == version + 2
+
+
+def unique_titles(api, db):
+    api.post("/api/tasks", json={"title": "Taken"})
+    run(db.tasks.create_index("title", unique=True))
+
+
+def test_ordered_write_error_skips_the_rest(api, db, events):
+    unique_titles(api, db)
+    events.clear()
+    body = bulk(api, [
+        {"op": "create", "data": {"title": "Fresh"}},
+        {"op": "create", "data": {"title": "Taken"}},
+        {"op": "create", "data": {"title": "Later"}},
+    ])
+    assert statuses(body) == ["ok", "error", "skipped"]
+    assert "duplicate" in body["results"][1]["error"].lower()
+    assert [event[0] for event in events] == ["created"]
+
+
+def test_unordered_write_errors_map_back_to_operations(api, db, events):
+    unique_titles(api, db)
+    version = run(server.get_task_version(USER_ID))
+    events.clear()
+
+    # The invalid first operation is never sent, so write indexes are offset by one
+    body = bulk(api, [
+        {"op": "create", "data": {}},
+        {"op": "create", "data": {"title": "Fresh"}},
+        {"op": "create", "data": {"title": "Taken"}},
+        {"op": "create", "data": {"title": "Later"}},
+    ], ordered=False)
+
+    assert statuses(body) == ["error", "ok", "error", "ok"]
+    assert "duplicate" in body["results"][2]["error"].lower()
+    assert [event[1] for event in events] == [body["results"][1]["id"], body["results"][3]["id"]]
+    assert run(server.get_task_version(USER_ID)) == version + 2
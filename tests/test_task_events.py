@@ -0,0 +1,92 @@
+import asyncio
+from types import SimpleNamespace
+
+import server
+from tests.conftest import run
+
+
+def broker(buffer_size=10, queue_size=10):
+    return server.TaskEventBroker(buffer_size, queue_size, 100)
+
+
+def publish(events, ids):
+    for event_id in ids:
+        events.publish("user", "updated", f"task-{event_id}", event_id=event_id)
+
+
+def test_resume_replays_events_after_last_event_id():
+    events = broker()
+    publish(events, range(1, 6))
+    _, missed = events.subscribe("user", 3)
+    assert [event["id"] for event in missed] == [4, 5]
+    _, missed = events.subscribe("user", 5)
+    assert missed == []
+
+
+def test_resume_resets_after_a_gap():
+    events = broker(buffer_size=3)
+    publish(events, range(1, 7))
+    assert events.subscribe("user", 2)[1] == [{"type": "reset"}]
+    assert [event["id"] for event in events.subscribe("user", 3)[1]] == [4, 5, 6]
+    # An id this worker has not reached yet cannot be resumed here either
+    assert events.subscribe("user", 9)[1] == [{"type": "reset"}]
+
+
+def test_queue_overflow_is_replaced_by_reset():
+    events = broker(queue_size=2)
+    queue, _ = events.subscribe("user")
+    publish(events, range(1, 4))
+    assert queue.get_nowait() == {"type": "reset"}
+    assert queue.empty()
+
+
+def test_resume_tokens_resume_on_any_worker():
+    tokens = ["8263a1", "8263a2", "8263a3"]
+    workers = [broker(), broker()]
+    for events in workers:
+        publish(events, tokens)
+
+    _, missed = workers[1].subscribe("user", tokens[0])
+    assert [event["id"] for event in missed] == tokens[1:]
+    assert workers[1].subscribe("user", "unknown")[1] == [{"type": "reset"}]
+
+
+def test_change_stream_events_use_the_resume_token(monkeypatch):
+    changes = [
+        {"_id": {"_data": "token-1"}, "operationType": "insert",
+         "fullDocument": {"id": "task-1", "user_id": "user", "title": "Watched"}},
+        {"_id": {"_data": "token-2"}, "operationType": "delete",
+         "fullDocumentBeforeChange": {"id": "task-1", "user_id": "user", "title": "Watched"}},
+    ]
+
+    class ChangeStream:
+        resume_token = None
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc_info):
+            return False
+
+        async def __aiter__(self):
+            for change in changes:
+                self.resume_token = change["_id"]
+                yield change
+            await asyncio.Event().wait()
+
+    monkeypatch.setattr(server, "db", SimpleNamespace(tasks=SimpleNamespace(watch=lambda **kwargs: ChangeStream())))
+    monkeypatch.setattr(server, "task_events", broker())
+
+    async def watch_briefly():
+        watcher = asyncio.create_task(server.watch_task_changes())
+        await asyncio.sleep(0.05)
+        watcher.cancel()
+        await asyncio.gather(watcher, return_exceptions=True)
+
+    run(watch_briefly())
+    _, missed = server.task_events.subscribe("user", "token-1")
+    assert [(event["id"], event["type"]) for event in missed] == [("token-2", "deleted")]
+
+
+def test_invalid_last_event_id_is_rejected(api):
+    assert api.get("/api/tasks/stream", headers={"Last-Event-ID": "abc"}).status_code == 400
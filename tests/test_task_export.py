@@ -0,0 +1,110 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+# Streams an export of COUNT generated tasks through the full ASGI app, discarding
+# the body as it arrives, and reports bytes sent and the process's peak RSS.
+EXPORT_SCRIPT = """
+import asyncio, os, resource, sys
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "test_db")
+sys.path.insert(0, {backend!r})
+import server
+
+count, export_format = int(sys.argv[1]), sys.argv[2]
+created_at = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+class GeneratedCursor:
+    # Yields documents one at a time, like a Motor cursor over a large collection
+    def sort(self, *args):
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    async def __aiter__(self):
+        for i in range(count):
+            yield {{
+                "id": f"task-{{i:08d}}",
+                "title": f"Exported task {{i}}",
+                "description": "Streamed without building the whole list in memory",
+                "due_date": created_at + timedelta(days=i % 30),
+                "status": "pending",
+                "priority": "medium",
+                "created_at": created_at,
+                "updated_at": created_at,
+            }}
+
+
+server.db = SimpleNamespace(tasks=SimpleNamespace(find=lambda *args, **kwargs: GeneratedCursor()))
+user = server.User(id="export-user", email="export@example.com", name="Export")
+server.session_cache.set("export-token", user, datetime.now(timezone.utc) + timedelta(days=1))
+
+
+async def main():
+    sent = 0
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {{"type": "http.request", "body": b"", "more_body": False}}
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal sent
+        if message["type"] == "http.response.body":
+            sent += len(message.get("body", b""))
+
+    scope = {{
+        "type": "http", "asgi": {{"version": "3.0"}}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/api/tasks/export", "raw_path": b"/api/tasks/export",
+        "query_string": f"format={{export_format}}".encode(), "root_path": "",
+        "headers": [(b"authorization", b"Bearer export-token")],
+        "client": ("127.0.0.1", 1234), "server": ("testserver", 80),
+    }}
+    await server.app(scope, receive, send)
+    return sent
+
+
+sent = asyncio.run(main())
+print(sent, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+""".format(backend=str(Path(__file__).parent.parent / "backend"))
+
+
+def export_peak_rss(count: int, export_format: str):
+    """Return (bytes exported, peak RSS in bytes) for exporting ``count`` tasks."""
+    result = subprocess.run(
+        [sys.executable, "-c", EXPORT_SCRIPT, str(count), export_format],
+        capture_output=True, text=True, check=True
+    )
+    sent, max_rss_kb = map(int, result.stdout.split())
+    return sent, max_rss_kb * 1024
+
+
+@pytest.mark.parametrize("export_format", ["ndjson", "csv"])
+def test_export_memory_stays_flat(export_format):
+    small_bytes, small_rss = export_peak_rss(2_000, export_format)
+    large_bytes, large_rss = export_peak_rss(200_000, export_format)
+
+    # 100x the tasks and tens of megabytes of output, but peak RSS barely moves
+    assert large_bytes > 30 * 1024 * 1024
+    assert large_bytes > 90 * small_bytes
+    assert large_rss - small_rss < 16 * 1024 * 1024
+
+
+def test_export_streams_ndjson(api):
+    for i in range(3):
+        api.post("/api/tasks", json={"title": f"Task {i}"})
+    response = api.get("/api/tasks/export")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [line["title"] for line in lines] == ["Task 0", "Task 1", "Task 2"]
@@ -0,0 +1,49 @@
+import server
+from tests.conftest import run
+from tests.test_task_archive import age_tasks, create_completed_tasks
+
+
+def test_list_returns_only_requested_fields(api):
+    for i in range(3):
+        api.post("/api/tasks", json={"title": f"Task {i}", "priority": "high"})
+    response = api.get("/api/tasks", params={"fields": "title,status"})
+    assert response.status_code == 200
+    assert [sorted(task) for task in response.json()] == [["id", "status", "title"]] * 3
+
+
+def test_sort_helper_fields_are_dropped_and_cursors_still_work(api):
+    for i in range(3):
+        api.post("/api/tasks", json={"title": f"Task {i}", "priority": ["low", "medium", "high"][i]})
+    titles = []
+    cursor = None
+    while True:
+        params = {"fields": "title", "sort": "priority", "order": "desc", "limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = api.get("/api/tasks", params=params)
+        assert all(sorted(task) == ["id", "title"] for task in response.json())
+        titles += [task["title"] for task in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert titles == ["Task 2", "Task 1", "Task 0"]
+
+
+def test_single_task_fields_keep_etag_but_drop_version(api):
+    task_id = api.post("/api/tasks", json={"title": "Projected"}).json()["id"]
+    full = api.get(f"/api/tasks/{task_id}")
+    response = api.get(f"/api/tasks/{task_id}", params={"fields": "title"})
+    assert response.json() == {"id": task_id, "title": "Projected"}
+    assert response.headers["ETag"] == full.headers["ETag"]
+
+
+def test_archive_fields(api, db):
+    task_ids = create_completed_tasks(api, 1)
+    age_tasks(db, task_ids)
+    run(server.archive_completed_tasks())
+    assert api.get("/api/tasks/archive", params={"fields": "status"}).json() == [{"id": task_ids[0], "status": "completed"}]
+
+
+def test_unknown_fields_are_rejected(api):
+    for path in ("/api/tasks", "/api/tasks/archive"):
+        response = api.get(path, params={"fields": "title,priority_rank,title_terms"})
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Unknown fields: priority_rank, title_terms"
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import server
+
+PRIORITIES = ["low", "medium", "high"]
+
+
+def create_tasks(api, count):
+    base = datetime(2030, 1, 1, tzinfo=timezone.utc)
+    tasks = []
+    for i in range(count):
+        # Repeated and missing due dates exercise the id tiebreak and null handling
+        due_date = None if i % 3 == 0 else base + timedelta(days=i % 4)
+        task = api.post("/api/tasks", json={
+            "title": f"Task {i}",
+            "priority": PRIORITIES[i % 3],
+            "due_date": due_date.isoformat() if due_date else None,
+        }).json()
+        tasks.append({"id": task["id"], "due_date": due_date, "priority": task["priority"]})
+    return tasks
+
+
+def page_through(api, **params):
+    ids, cursor, pages = [], None, 0
+    while True:
+        response = api.get("/api/tasks", params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        ids += [task["id"] for task in response.json()]
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return ids, pages
+
+
+@pytest.mark.parametrize("order", ["asc", "desc"])
+def test_due_date_pages_put_missing_dates_first_ascending_and_last_descending(api, order):
+    tasks = create_tasks(api, 11)
+    expected = sorted(
+        tasks, key=lambda task: (task["due_date"] is not None, task["due_date"] or datetime.min.replace(tzinfo=timezone.utc), task["id"])
+    )
+    if order == "desc":
+        expected.reverse()
+
+    ids, pages = page_through(api, sort="due_date", order=order, limit=2)
+    assert ids == [task["id"] for task in expected]
+    assert pages == 6
+
+
+@pytest.mark.parametrize("order", ["asc", "desc"])
+def test_priority_pages_follow_rank_not_name(api, order):
+    tasks = create_tasks(api, 7)
+    expected = sorted(tasks, key=lambda task: (server.PRIORITY_RANK[task["priority"]], task["id"]), reverse=order == "desc")
+
+    ids, _ = page_through(api, sort="priority", order=order, limit=3)
+    assert ids == [task["id"] for task in expected]
+
+
+def test_cursor_must_match_sort(api):
+    create_tasks(api, 3)
+    cursor = api.get("/api/tasks", params={"sort": "due_date", "limit": 1}).headers["X-Next-Cursor"]
+    assert api.get("/api/tasks", params={"sort": "due_date", "order": "desc", "cursor": cursor}).status_code == 400
+    assert api.get("/api/tasks", params={"cursor": "garbage"}).status_code == 400
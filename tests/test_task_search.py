@@ -0,0 +1,82 @@
+import server
+from tests.conftest import run
+
+
+class RecordingCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, *args):
+        return self
+
+    def limit(self, length):
+        self.docs = self.docs[:length]
+        return self
+
+    async def to_list(self, length):
+        return self.docs
+
+
+class RecordingTasks:
+    """Stands in for db.tasks where mongomock lacks $text: answers text and prefix queries."""
+
+    def __init__(self, text_hits, prefix_hits):
+        self.text_hits = text_hits
+        self.prefix_hits = prefix_hits
+        self.queries = []
+
+    def find(self, query, projection=None):
+        self.queries.append(query)
+        return RecordingCursor(list(self.text_hits if "$text" in query else self.prefix_hits))
+
+
+class RecordingDatabase:
+    def __init__(self, tasks):
+        self.tasks = tasks
+
+
+def test_search_terms_follow_title_and_description(api, db):
+    task_id = api.post("/api/tasks", json={"title": "Quarterly Report", "description": "Send to the team"}).json()["id"]
+    task = run(db.tasks.find_one({"id": task_id}))
+    assert task["title_terms"] == ["quarterly", "report"]
+    assert task["description_terms"] == ["send", "to", "the", "team"]
+
+    api.put(f"/api/tasks/{task_id}", json={"title": "Annual report"})
+    task = run(db.tasks.find_one({"id": task_id}))
+    assert task["title_terms"] == ["annual", "report"]
+    assert task["description_terms"] == ["send", "to", "the", "team"]
+
+
+def test_single_term_is_ranked_by_text_index_before_prefix_matches(monkeypatch):
+    tasks = RecordingTasks(text_hits=[{"id": "exact"}], prefix_hits=[{"id": "longer"}])
+    monkeypatch.setattr(server, "db", RecordingDatabase(tasks))
+
+    results = run(server.text_search("user", ["rep"], prefix=True, window=10))
+
+    assert [task["id"] for task in results] == ["exact", "longer"]
+    text_query, prefix_query = tasks.queries
+    assert text_query["$text"] == {"$search": "rep"}
+    assert prefix_query["id"] == {"$nin": ["exact"]}
+    assert {"title_terms": {"$regex": "^rep"}} in prefix_query["$or"]
+
+
+def test_prefix_narrows_the_ranked_query_when_other_terms_are_complete(monkeypatch):
+    tasks = RecordingTasks(text_hits=[{"id": "a"}], prefix_hits=[])
+    monkeypatch.setattr(server, "db", RecordingDatabase(tasks))
+
+    run(server.text_search("user", ["quarterly", "rep"], prefix=True, window=10))
+
+    [text_query] = tasks.queries
+    assert text_query["$text"] == {"$search": '"quarterly" rep'}
+    assert {"description_terms": {"$regex": "^rep"}} in text_query["$or"]
+
+
+def test_memory_backend_prefix_search(api, monkeypatch):
+    monkeypatch.setattr(server, "SEARCH_BACKEND", "memory")
+    api.post("/api/tasks", json={"title": "Quarterly report"})
+    api.post("/api/tasks", json={"title": "Repair bike", "description": "report the damage"})
+    api.post("/api/tasks", json={"title": "Groceries"})
+
+    titles = {task["title"] for task in api.get("/api/tasks/search", params={"q": "rep"}).json()}
+    assert titles == {"Quarterly report", "Repair bike"}
+    assert api.get("/api/tasks/search", params={"q": "rep", "prefix": "false"}).json() == []
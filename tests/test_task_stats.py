@@ -0,0 +1,64 @@
+import server
+from tests.conftest import USER_ID, run
+
+
+def counters(db):
+    return run(db.task_counters.find_one({"user_id": USER_ID}, {"_id": 0, "user_id": 0}))
+
+
+def test_stats_seed_and_follow_writes(api, db, monkeypatch):
+    monkeypatch.setattr(server, "TASK_COUNTERS_ENABLED", True)
+    api.post("/api/tasks", json={"title": "Before seeding"})
+    assert api.get("/api/tasks/stats").json()["total"] == 1
+
+    task_id = api.post("/api/tasks", json={"title": "After seeding", "priority": "high"}).json()["id"]
+    api.put(f"/api/tasks/{task_id}", json={"status": "completed"})
+    stats = api.get("/api/tasks/stats").json()
+    assert stats["total"] == 2
+    assert stats["by_status"] == {"pending": 1, "completed": 1}
+    assert stats["by_priority"] == {"medium": 1, "high": 1}
+
+
+def test_seeding_never_overwrites_live_counters(api, db, monkeypatch):
+    monkeypatch.setattr(server, "TASK_COUNTERS_ENABLED", True)
+    api.post("/api/tasks", json={"title": "Seeded"})
+    api.get("/api/tasks/stats")
+    count_task_counters = server.count_task_counters
+
+    async def count_then_race(user_id):
+        stale = await count_task_counters(user_id)
+        # A create lands between the count and the write
+        api.post("/api/tasks", json={"title": "Raced"})
+        return stale
+
+    monkeypatch.setattr(server, "count_task_counters", count_then_race)
+    assert run(server.seed_task_counters(USER_ID))["total"] == 2
+    assert counters(db)["total"] == 2
+
+
+def test_resync_repairs_drift(api, db, monkeypatch):
+    monkeypatch.setattr(server, "TASK_COUNTERS_ENABLED", True)
+    for i in range(3):
+        api.post("/api/tasks", json={"title": f"Task {i}"})
+    api.get("/api/tasks/stats")
+    run(db.task_counters.update_one({"user_id": USER_ID}, {"$inc": {"total": 5, "by_status.pending": -2}}))
+
+    assert run(server.resync_task_counters(USER_ID))
+    assert counters(db)["total"] == 3
+    assert counters(db)["by_status"]["pending"] == 3
+
+
+def test_resync_skips_users_changing_during_the_count(api, db, monkeypatch):
+    monkeypatch.setattr(server, "TASK_COUNTERS_ENABLED", True)
+    api.post("/api/tasks", json={"title": "Seeded"})
+    api.get("/api/tasks/stats")
+    count_task_counters = server.count_task_counters
+
+    async def count_then_race(user_id):
+        actual = await count_task_counters(user_id)
+        api.post("/api/tasks", json={"title": "Raced"})
+        return actual
+
+    monkeypatch.setattr(server, "count_task_counters", count_then_race)
+    assert not run(server.resync_task_counters(USER_ID))
+    assert counters(db)["total"] == 2
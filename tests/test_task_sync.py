@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta, timezone
+
+import server
+from tests.conftest import run
+from tests.test_task_archive import age_tasks, create_completed_tasks
+
+
+def sync(api, token=None, **params):
+    if token:
+        params["since"] = token
+    response = api.get("/api/tasks/sync", params=params)
+    assert response.status_code == 200
+    return response.json()
+
+
+def create_tasks(api, count, prefix="Task"):
+    return [api.post("/api/tasks", json={"title": f"{prefix} {i}"}).json()["id"] for i in range(count)]
+
+
+def past_token(seconds=60):
+    return server.encode_sync_token(datetime.now(timezone.utc) - timedelta(seconds=seconds), "")
+
+
+def test_full_sync_returns_live_tasks(api):
+    task_ids = create_tasks(api, 3)
+    body = sync(api)
+    assert [task["id"] for task in body["tasks"]] == task_ids
+    assert body["deleted"] == []
+    assert body["has_more"] is False
+
+
+def test_single_delete_leaves_tombstone(api):
+    task_ids = create_tasks(api, 2)
+    token = past_token()
+    api.delete(f"/api/tasks/{task_ids[0]}")
+    body = sync(api, token)
+    assert body["deleted"] == [task_ids[0]]
+    assert [task["id"] for task in body["tasks"]] == [task_ids[1]]
+
+
+def test_bulk_delete_leaves_tombstones(api):
+    task_ids = create_tasks(api, 3)
+    token = past_token()
+    api.post("/api/tasks/bulk", json={"operations": [{"op": "delete", "id": task_id} for task_id in task_ids[:2]]})
+    assert set(sync(api, token)["deleted"]) == set(task_ids[:2])
+
+
+def test_archiving_leaves_tombstones(api, db):
+    task_ids = create_completed_tasks(api, 2)
+    age_tasks(db, task_ids)
+    token = past_token()
+    assert run(server.archive_completed_tasks()) == 2
+    body = sync(api, token)
+    assert set(body["deleted"]) == set(task_ids)
+    assert body["tasks"] == []
+
+
+def test_has_more_pages_through_mixed_changes(api):
+    task_ids = create_tasks(api, 6)
+    token = past_token()
+    for task_id in task_ids[:3]:
+        api.delete(f"/api/tasks/{task_id}")
+    updated = create_tasks(api, 2, prefix="Late")
+
+    seen_tasks, seen_deleted, pages = [], [], 0
+    while True:
+        body = sync(api, token, limit=2)
+        pages += 1
+        assert len(body["tasks"]) + len(body["deleted"]) <= 2
+        seen_tasks += [task["id"] for task in body["tasks"]]
+        seen_deleted += body["deleted"]
+        token = body["token"]
+        if not body["has_more"]:
+            break
+
+    assert pages == 4
+    assert sorted(seen_deleted) == sorted(task_ids[:3])
+    assert sorted(seen_tasks) == sorted(task_ids[3:] + updated)
+
+
+def test_final_token_overlaps_recent_writes(api):
+    task_ids = create_tasks(api, 2)
+    body = sync(api)
+    changed_at, last_id = server.decode_sync_token(body["token"])
+    assert last_id == ""
+    assert changed_at <= datetime.now(timezone.utc) - timedelta(seconds=server.SYNC_OVERLAP_SECONDS)
+    # Writes inside the overlap window are sent again rather than risk missing one in flight
+    assert [task["id"] for task in sync(api, body["token"])["tasks"]] == task_ids
+
+
+def test_bad_token_is_rejected(api):
+    assert api.get("/api/tasks/sync", params={"since": "not-a-token"}).status_code == 400
+    naive = server.encode_sync_token(datetime(2024, 1, 1), "")
+    assert api.get("/api/tasks/sync", params={"since": naive}).status_code == 400
+
+
+def test_expired_token_is_gone(api):
+    expired = past_token((server.SYNC_TOMBSTONE_TTL_DAYS + 1) * 86400)
+    assert api.get("/api/tasks/sync", params={"since": expired}).status_code == 410